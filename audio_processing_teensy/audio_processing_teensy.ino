@@ -13,6 +13,24 @@
 
 const int bins_qty = 24;
 
+// send bins as binary packets instead of lines of text
+// formatting floats as text is the most expensive part of each frame
+const bool binary_packets = false;
+
+// marks the start of each binary packet, must not be `l` or `r` so the host
+// can tell which format is being sent
+const uint8_t packet_sync[2] = {0xA5, 0x5A};
+
+// the layout the host expects, all values are little endian
+struct __attribute__((packed)) BinPacket
+{
+  uint8_t sync[2];
+  char channel;
+  uint32_t id;
+  uint8_t bins_qty;
+  float bins[bins_qty];
+};
+
 // GUItool: begin automatically generated code
 AudioInputUSB audio_input;   //xy=612.8888244628906,234.99999809265137
 AudioAnalyzeFFT1024 l_fft;   //xy=860.8888282775879,335.00001335144043
@@ -47,6 +65,36 @@ void setup()
   r_fft.windowFunction(AudioWindowFlattop1024);
 }
 
+BinPacket packet;
+
+void send_bins(char channel, unsigned long id, float *bins)
+{
+  if (binary_packets)
+  {
+    packet.sync[0] = packet_sync[0];
+    packet.sync[1] = packet_sync[1];
+    packet.channel = channel;
+    packet.id = id;
+    packet.bins_qty = bins_qty;
+    memcpy(packet.bins, bins, sizeof(packet.bins));
+    Serial.write((const uint8_t *)&packet, sizeof(packet));
+    return;
+  }
+
+  Serial.print(channel);
+  Serial.print(":");
+  Serial.print(id);
+  Serial.print(":");
+  // print the first bin outside the loop to prevent preceding comma
+  Serial.print(bins[0], 16);
+  for (int i = 1; i < bins_qty; i++)
+  {
+    Serial.print(",");
+    Serial.print(bins[i], 16);
+  }
+  Serial.println();
+}
+
 //
 unsigned long prints = 0;
 bool l_fft_recieved = false;
@@ -87,17 +135,7 @@ void loop()
       prints = prints + 1;
     }
 
-    Serial.print("l:");
-    Serial.print(prints);
-    Serial.print(":");
-    // print the first l_bins outside the loop to prevent preceding comma
-    Serial.print(l_bins[0], 16);
-    for (int i = 1; i < bins_qty; i++)
-    {
-      Serial.print(",");
-      Serial.print(l_bins[i], 16);
-    }
-    Serial.println();
+    send_bins('l', prints, l_bins);
     l_fft_recieved = true;
   }
 
@@ -134,17 +172,7 @@ void loop()
       prints = prints + 1;
     }
 
-    Serial.print("r:");
-    Serial.print(prints);
-    Serial.print(":");
-    // print the first r_bins outside the loop to prevent preceding comma
-    Serial.print(r_bins[0], 16);
-    for (int i = 1; i < bins_qty; i++)
-    {
-      Serial.print(",");
-      Serial.print(r_bins[i], 16);
-    }
-    Serial.println();
+    send_bins('r', prints, r_bins);
     r_fft_recieved = true;
   }
   if (l_fft_recieved && r_fft_recieved)
@@ -19,6 +19,10 @@ import serial
 
 import led_wall_driver_software as driver
 
+# frames sent with a trace id are replied to with the id and how many seconds
+# it took to show the frame after receiving it
+TRACE_REPLY = struct.Struct("!Qd")
+
 
 class ConnectionClosed(Exception):
     pass
@@ -85,13 +89,33 @@ class MatrixServer:
             except ConnectionClosed:
                 continue
 
+            received_time = time.monotonic()
+
             frame = pickle.loads(pickled_frame)
-            assert frame.shape == (
-                27,
-                48,
-                3,
-            ), f"frame had incorrect shape: {frame.shape}"
-            self._led_matrix(frame)
+            trace_id = None
+            if isinstance(frame, tuple):
+                # the client is tracing latency
+                frame, trace_id = frame
+            if frame.ndim == 1:
+                # already flattened in the order the LEDs are wired in
+                assert frame.shape == (
+                    self._height * self._width * 3,
+                ), f"frame had incorrect shape: {frame.shape}"
+                self._led_matrix.write(frame)
+            else:
+                assert frame.shape == (
+                    27,
+                    48,
+                    3,
+                ), f"frame had incorrect shape: {frame.shape}"
+                self._led_matrix(frame)
+
+            if trace_id is not None:
+                self._client.sendall(
+                    TRACE_REPLY.pack(
+                        trace_id, time.monotonic() - received_time
+                    )
+                )
 
     def _receive_exactly(self, sock: socket.socket, n) -> bytes:
         data = b""
@@ -24,14 +24,51 @@ class LEDWall:
 
         self.serpentine = serpentine
 
+        # where each byte written to the LED wall comes from in a frame
+        self._led_order = self.led_order(width, height, serpentine)
+        self._led_frame = np.empty(len(self._led_order), dtype=np.uint8)
+
+    @classmethod
+    def led_order(cls, width: int, height: int, serpentine: bool = True) -> np.ndarray:
+        """Where each byte the LED wall shows comes from in a flattened frame
+
+        The LEDs are wired in rows from the bottom up, every other one running
+        backwards if `serpentine`.
+
+        Returns:
+            NDArray[(Any,), Int]: (height * width * 3) indexes into a
+                (height, width, 3) frame's bytes
+        """
+        pixels = np.arange(height * width).reshape(height, width)
+        if serpentine:
+            pixels = cls._serpentinize(pixels)
+        pixels = np.flipud(pixels)
+        return (pixels.reshape(-1, 1) * 3 + np.arange(3)).reshape(-1)
+
     def __call__(self, frame: np.ndarray) -> None:
-        if self.serpentine:
-            frame = self._serpentinize(frame)
+        """Show a (height, width, 3) frame"""
+        if frame.size != len(self._led_order) or frame.dtype != np.uint8:
+            raise RuntimeError(
+                f"frame must be {(self.height, self.width, 3)} uint8, "
+                f"not {frame.shape} {frame.dtype}"
+            )
+
+        # serpentinize and flip it in one go
+        np.take(
+            np.ascontiguousarray(frame).reshape(-1),
+            self._led_order,
+            out=self._led_frame,
+            mode="clip",
+        )
+        self.write(self._led_frame)
 
-        # flip frame
-        frame = np.flipud(frame)
+    def write(self, led_frame: np.ndarray) -> None:
+        """Show a frame that is already in the order the LEDs are wired in
 
-        self.led_wall_port.write(frame.tobytes())
+        Args:
+            led_frame: uint8 bytes in the order of `led_order`
+        """
+        self.led_wall_port.write(memoryview(led_frame))
 
         # wait for the LED wall to respond
         self.led_wall_port.readline()
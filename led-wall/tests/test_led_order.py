@@ -0,0 +1,48 @@
+"""test that LEDWall writes frames in the order the LEDs are wired in"""
+
+import numpy as np
+import pytest
+
+import led_wall_driver_software
+
+
+class MockSerial:
+    def __init__(self):
+        self.written = None
+
+    def write(self, input_):
+        self.written = bytes(input_)
+
+    def readline(self):
+        pass
+
+
+@pytest.mark.parametrize("width,height", [(1, 1), (3, 2), (4, 4), (48, 27)])
+@pytest.mark.parametrize("serpentine", [False, True])
+def test_led_order(width: int, height: int, serpentine: bool):
+    frame = np.random.default_rng(0).integers(
+        0, 256, (height, width, 3), dtype=np.uint8
+    )
+    original = frame.copy()
+    expected = frame.copy()
+    if serpentine:
+        expected = led_wall_driver_software.LEDWall._serpentinize(expected)
+    expected = np.flipud(expected)
+
+    mock_serial = MockSerial()
+    led_wall = led_wall_driver_software.LEDWall(
+        led_wall_port=mock_serial,
+        width=width,
+        height=height,
+        serpentine=serpentine,
+    )
+    led_wall(frame)
+
+    assert mock_serial.written == expected.tobytes()
+    # the frame itself is left alone
+    assert np.array_equal(frame, original)
+
+    # and frames already in that order are written as they are
+    led_order = led_wall.led_order(width, height, serpentine)
+    led_wall.write(frame.reshape(-1)[led_order])
+    assert mock_serial.written == expected.tobytes()
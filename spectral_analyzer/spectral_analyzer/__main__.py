@@ -2,17 +2,22 @@ import multiprocessing as mp
 import sys
 import time
 
-from . import config, emulated_led_wall, frame_generation, remote_led_wall
+from . import config, emulated_led_wall, remote_led_wall
+from .frame_generation import frame_generation
 
 
 def main():
     frame_queues = []
     if config["emulator-window"]["enabled"]:
-        emulator_frame_queue = mp.Queue()
+        emulator_frame_queue = mp.Queue(
+            maxsize=frame_generation.FRAME_QUEUE_SIZE
+        )
         frame_queues.append(emulator_frame_queue)
 
     if config["led-matrix"]["enabled"]:
-        remote_frame_queue = mp.Queue()
+        remote_frame_queue = mp.Queue(
+            maxsize=frame_generation.FRAME_QUEUE_SIZE
+        )
         frame_queues.append(remote_frame_queue)
 
     frame_generation_process = mp.Process(
@@ -24,6 +29,20 @@ def main():
             "height": config["matrix_height"],
             "style": config["style"],
             "gradient_str": config["gradient"],
+            "normalize_channels_separately": config.get(
+                "normalize_channels_separately", False
+            ),
+            "serial_ingest": config.get("serial_ingest", "stream"),
+            "source": config.get("source", "serial"),
+            "replay_file": config.get("replay", {}).get("file", ""),
+            "replay_speed": config.get("replay", {}).get("speed", 1),
+            "analysis_config": config.get("analysis"),
+            "display_rate": config.get("display_rate", 0),
+            "trace_latency": config.get("trace_latency", False),
+            "smoothing_config": config.get("smoothing"),
+            "layers": config.get("layers"),
+            "gradient_cache_dir": config.get("gradient_cache_dir", ""),
+            "gradient_direction": config.get("gradient_direction", "vertical"),
         },
         daemon=True,
     )
@@ -51,6 +70,11 @@ def main():
                 "frame_queue": remote_frame_queue,
                 "led_wall_server": config["led-matrix"]["url"],
                 "brightness": config["led-matrix"]["brightness"],
+                "calibration_file": config["led-matrix"].get(
+                    "calibration", ""
+                ),
+                "dither": config["led-matrix"].get("dither", False),
+                "trace_latency": config.get("trace_latency", False),
             },
             daemon=True,
         )
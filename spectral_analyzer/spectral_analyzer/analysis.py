@@ -0,0 +1,274 @@
+"""Compute bins from audio on the host rather than on the Teensy."""
+
+import time
+import wave
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import bin_mapping, teensy_reciever
+
+# the `fft.read(first, last)` ranges in `audio_processing_teensy.ino`
+TEENSY_BIN_RANGES: Tuple[Tuple[int, int], ...] = (
+    (0, 2),
+    (3, 3),
+    (4, 5),
+    (6, 7),
+    (8, 9),
+    (10, 12),
+    (13, 15),
+    (16, 19),
+    (20, 23),
+    (24, 29),
+    (30, 35),
+    (36, 43),
+    (44, 52),
+    (53, 63),
+    (64, 75),
+    (76, 90),
+    (91, 108),
+    (109, 129),
+    (130, 155),
+    (156, 184),
+    (185, 220),
+    (221, 262),
+    (263, 312),
+    (313, 372),
+)
+TEENSY_SAMPLE_RATE = 44100
+TEENSY_FFT_SIZE = 1024
+
+# how many samples are read from the input at a time
+_BLOCK_SIZE = 1 << 14
+
+
+def teensy_band_edges() -> NDArray[np.float64]:
+    """The edges of the Teensy's bands, in Hz"""
+    bin_width = TEENSY_SAMPLE_RATE / TEENSY_FFT_SIZE
+    first_bins = np.array([first for first, _ in TEENSY_BIN_RANGES])
+    last_bin = TEENSY_BIN_RANGES[-1][1]
+    # each band starts halfway between its first bin and the one before it
+    return np.append(first_bins - 0.5, last_bin + 0.5) * bin_width
+
+
+def flattop_window(size: int) -> NDArray[np.float32]:
+    """The window the Teensy uses (`AudioWindowFlattop1024`)"""
+    coefficients = (
+        0.21557895,
+        -0.41663158,
+        0.277263158,
+        -0.083578947,
+        0.006947368,
+    )
+    phase = 2 * np.pi * np.arange(size) / (size - 1)
+    window = sum(
+        coefficient * np.cos(k * phase)
+        for k, coefficient in enumerate(coefficients)
+    )
+    return window.astype(np.float32)
+
+
+class FFTAnalyzer:
+    """Turns blocks of PCM into bands, the way the Teensy does
+
+    Windows of `fft_size` samples are taken every `hop_size` samples. All the
+    windows a block of samples completes are transformed together, and each
+    spectrum is reduced to bands by summing the FFT bins between the band
+    edges. Samples left over from one block are carried into the next.
+
+    By default the bands are the Teensy's, with `band_count` they are instead
+    evenly spaced in ERB (see `bin_mapping`).
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int = 2,
+        fft_size: int = TEENSY_FFT_SIZE,
+        hop_size: int | None = None,
+        band_count: int | None = None,
+    ):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        # like the Teensy, default to windows that overlap by half
+        self.hop_size = hop_size or fft_size // 2
+
+        if band_count is None:
+            self._mapping = bin_mapping.mapping_from_edges(
+                sample_rate, fft_size, tuple(teensy_band_edges())
+            )
+        else:
+            self._mapping = bin_mapping.band_mapping(
+                sample_rate, fft_size, band_count
+            )
+        self.band_count = self._mapping.band_count
+
+        self._window = flattop_window(fft_size)
+        # a full scale sine comes out at about 1, as it does on the Teensy
+        self._scale = 2 / self._window.sum()
+
+        # samples that have not been part of a window yet, plus the ones
+        # before them that overlap into the next window
+        self._history = np.zeros((0, channels), dtype=np.float32)
+
+    def __call__(self, samples: NDArray[np.float32]) -> NDArray[np.float32]:
+        """Analyze the next block of samples
+
+        Args:
+            samples: float samples between -1 and 1 with the shape
+                (samples, channels)
+
+        Returns:
+            the bands of every window completed by the block, with the shape
+                (windows, channels, bands)
+        """
+        samples = np.concatenate((self._history, samples))
+        window_count = max(
+            0, (len(samples) - self.fft_size) // self.hop_size + 1
+        )
+        self._history = samples[window_count * self.hop_size :]
+        if not window_count:
+            return np.zeros(
+                (0, samples.shape[1], self.band_count), dtype=np.float32
+            )
+
+        # (windows, channels, fft_size) view, nothing is copied yet
+        windows = np.lib.stride_tricks.sliding_window_view(
+            samples, self.fft_size, axis=0
+        )[: window_count * self.hop_size : self.hop_size]
+        spectra = np.abs(np.fft.rfft(windows * self._window, axis=-1))
+        bands = self._mapping.apply(spectra)
+        bands *= self._scale
+        return bands.astype(np.float32)
+
+
+def _packets_from_blocks(
+    blocks: Iterator[NDArray[np.float32]],
+    analyzer: FFTAnalyzer,
+    paced: bool,
+) -> Iterator[teensy_reciever.Packet]:
+    id = 0
+    start_time = time.monotonic()
+    for block in blocks:
+        for bands in analyzer(block):
+            if paced:
+                # don't hand on a window before its last sample would have
+                # been heard
+                due = (id * analyzer.hop_size + analyzer.fft_size) / (
+                    analyzer.sample_rate
+                )
+                delay = due - (time.monotonic() - start_time)
+                if delay > 0:
+                    time.sleep(delay)
+
+            yield "l", id, bands[0]
+            yield "r", id, bands[-1]
+            id += 1
+
+
+def _read_wav(
+    wav_path: Path,
+) -> Tuple[int, int, Iterator[NDArray[np.float32]]]:
+    wav_file = wave.open(str(wav_path), "rb")
+    sample_width = wav_file.getsampwidth()
+    if sample_width not in (1, 2, 4):
+        raise ValueError(f"unsupported sample width: {sample_width * 8} bits")
+    channels = wav_file.getnchannels()
+
+    def blocks() -> Iterator[NDArray[np.float32]]:
+        with wav_file:
+            while True:
+                frames = wav_file.readframes(_BLOCK_SIZE)
+                if not frames:
+                    return
+                if sample_width == 1:
+                    # 8 bit wavs are unsigned
+                    raw_samples = np.frombuffer(frames, dtype=np.uint8)
+                    samples = (raw_samples.astype(np.float32) - 128) / 128
+                else:
+                    dtype = np.dtype(f"<i{sample_width}")
+                    raw_samples = np.frombuffer(frames, dtype=dtype)
+                    samples = raw_samples.astype(np.float32)
+                    samples /= np.iinfo(dtype).max
+                yield samples.reshape(-1, channels)
+
+    return wav_file.getframerate(), channels, blocks()
+
+
+def wav_packets(
+    wav_path: Path,
+    fft_size: int = TEENSY_FFT_SIZE,
+    hop_size: int | None = None,
+    band_count: int | None = None,
+    paced: bool = True,
+) -> Iterator[teensy_reciever.Packet]:
+    """Analyze a WAV file, producing the packets the Teensy would
+
+    Mono files are sent as both channels.
+
+    Args:
+        wav_path: the WAV file to analyze
+        fft_size: samples per FFT
+        hop_size: samples between the start of each FFT
+        band_count: how many bands to make, the Teensy's bands if not given
+        paced: produce packets as fast as the audio would play, rather than
+            as fast as possible
+    """
+    sample_rate, channels, blocks = _read_wav(wav_path)
+    analyzer = FFTAnalyzer(
+        sample_rate,
+        channels=channels,
+        fft_size=fft_size,
+        hop_size=hop_size,
+        band_count=band_count,
+    )
+    return _packets_from_blocks(blocks, analyzer, paced)
+
+
+def pyaudio_packets(
+    sample_rate: int = TEENSY_SAMPLE_RATE,
+    fft_size: int = TEENSY_FFT_SIZE,
+    hop_size: int | None = None,
+    band_count: int | None = None,
+) -> Iterator[teensy_reciever.Packet]:
+    """Analyze the default input device, producing the packets the Teensy would
+
+    Requires `pyaudio`.
+
+    Args:
+        sample_rate: the sample rate to record at
+        fft_size: samples per FFT
+        hop_size: samples between the start of each FFT
+        band_count: how many bands to make, the Teensy's bands if not given
+    """
+    # pyaudio is only needed when analyzing live audio
+    import pyaudio
+
+    analyzer = FFTAnalyzer(
+        sample_rate,
+        fft_size=fft_size,
+        hop_size=hop_size,
+        band_count=band_count,
+    )
+    audio = pyaudio.PyAudio()
+    stream = audio.open(
+        format=pyaudio.paFloat32,
+        channels=2,
+        rate=sample_rate,
+        input=True,
+        frames_per_buffer=analyzer.hop_size,
+    )
+
+    def blocks() -> Iterator[NDArray[np.float32]]:
+        try:
+            while True:
+                frames = stream.read(analyzer.hop_size)
+                yield np.frombuffer(frames, dtype=np.float32).reshape(-1, 2)
+        finally:
+            stream.close()
+            audio.terminate()
+
+    # the stream already runs in real time
+    return _packets_from_blocks(blocks(), analyzer, paced=False)
@@ -0,0 +1,156 @@
+"""Map FFT bins onto bands spaced by Equivalent Rectangular Bandwidth.
+
+See: https://en.wikipedia.org/wiki/Equivalent_rectangular_bandwidth
+"""
+
+import functools
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+DEFAULT_LOW_FREQ = 40
+DEFAULT_HIGH_FREQ = 16000
+
+
+class BandMapping(NamedTuple):
+    """How the bins of an FFT are grouped into bands
+
+    `starts` and `stop` give each FFT bin to the band its center falls in,
+    which is how the Teensy groups bins. `weights` instead spreads each bin
+    over the bands it overlaps, so bands narrower than a bin still get their
+    share of it.
+
+    Attributes:
+        edges: the edges of the bands in Hz, one more than there are bands
+        starts: the first FFT bin of each band, for `np.add.reduceat`
+        stop: the FFT bin after the last one in a band
+        weights: (stop, bands) how much of each FFT bin belongs to each band
+    """
+
+    edges: NDArray[np.float64]
+    starts: NDArray[np.intp]
+    stop: int
+    weights: NDArray[np.float32]
+
+    @property
+    def band_count(self) -> int:
+        return len(self.starts)
+
+    def apply(self, spectra: NDArray[np.float32]) -> NDArray[np.float32]:
+        """Reduce FFT magnitudes (in the last axis) to bands"""
+        return spectra[..., : self.stop] @ self.weights
+
+
+def erb_from_freq(freq: ArrayLike) -> NDArray[np.float64]:
+    """Get the ERB number (in cams) of the given frequencies"""
+    return 9.265 * np.log1p(np.divide(freq, 24.7 * 9.16))
+
+
+def freq_from_erb(cam: ArrayLike) -> NDArray[np.float64]:
+    """Get the frequencies of the given ERB numbers (in cams)
+
+    NOTE: this is the inverse of a slightly different ERB scale than
+        `erb_from_freq`, it is kept because the Teensy's bands were generated
+        with it
+    """
+    return 10 ** (np.divide(cam, 21.4)) / 0.00437 - 1 / 0.00437
+
+
+def erb_band_edges(
+    band_count: int,
+    low_freq: float = DEFAULT_LOW_FREQ,
+    high_freq: float = DEFAULT_HIGH_FREQ,
+) -> NDArray[np.float64]:
+    """Edges of bands evenly spaced in ERB between the two frequencies
+
+    Args:
+        band_count: how many bands to make
+        low_freq: where the first band starts (> 0)
+        high_freq: where the last band ends (<= 20,000)
+
+    Returns:
+        the band edges in Hz, rounded to the nearest Hz
+    """
+    cams = np.linspace(
+        erb_from_freq(low_freq), erb_from_freq(high_freq), band_count + 1
+    )
+    edges = np.round(freq_from_erb(cams))
+    edges[0] = low_freq
+    edges[-1] = high_freq
+    return edges
+
+
+def _readonly(array: NDArray) -> NDArray:
+    # these are shared through the cache
+    array.setflags(write=False)
+    return array
+
+
+@functools.lru_cache(maxsize=None)
+def mapping_from_edges(
+    sample_rate: float, fft_size: int, edges: Tuple[float, ...]
+) -> BandMapping:
+    """Map the bins of a real FFT onto bands with the given edges
+
+    Bins below the first band are given to it, like the Teensy does.
+
+    Args:
+        sample_rate: sample rate of the audio
+        fft_size: samples per FFT
+        edges: the edges of the bands in Hz
+
+    Returns:
+        the mapping
+    """
+    edges_array = np.asarray(edges, dtype=np.float64)
+    bin_width = sample_rate / fft_size
+    centers = np.fft.rfftfreq(fft_size, 1 / sample_rate)
+
+    # a bin belongs to the band its center is in
+    bounds = np.searchsorted(centers, edges_array, side="right")
+    bounds[0] = 0
+    starts = bounds[:-1]
+    stop = max(int(bounds[-1]), int(starts[-1]) + 1)
+
+    # how much of each bin's width overlaps each band
+    bin_lows = centers[:stop, None] - bin_width / 2
+    bin_highs = centers[:stop, None] + bin_width / 2
+    band_lows = edges_array[None, :-1].copy()
+    band_lows[0, 0] = -np.inf
+    band_highs = edges_array[None, 1:]
+    overlap = np.minimum(bin_highs, band_highs) - np.maximum(
+        bin_lows, band_lows
+    )
+    weights = np.clip(overlap / bin_width, 0, 1).astype(np.float32)
+
+    return BandMapping(
+        edges=_readonly(edges_array),
+        starts=_readonly(starts),
+        stop=stop,
+        weights=_readonly(weights),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def band_mapping(
+    sample_rate: float,
+    fft_size: int,
+    band_count: int,
+    low_freq: float = DEFAULT_LOW_FREQ,
+    high_freq: float = DEFAULT_HIGH_FREQ,
+) -> BandMapping:
+    """Map the bins of a real FFT onto bands evenly spaced in ERB
+
+    Args:
+        sample_rate: sample rate of the audio
+        fft_size: samples per FFT
+        band_count: how many bands to make
+        low_freq: where the first band starts
+        high_freq: where the last band ends
+
+    Returns:
+        the mapping
+    """
+    edges = erb_band_edges(band_count, low_freq, high_freq)
+    return mapping_from_edges(sample_rate, fft_size, tuple(edges))
@@ -0,0 +1,76 @@
+"""Correct the LED wall's colors with a lookup table for each channel."""
+
+from pathlib import Path
+from typing import NamedTuple, Sequence, Tuple
+
+import numpy as np
+import tomli
+from numpy.typing import NDArray
+
+# red, green and blue
+CHANNELS = 3
+
+
+def _per_channel(value: float | Sequence[float], name: str) -> Tuple:
+    if isinstance(value, (int, float)):
+        return (value,) * CHANNELS
+    if len(value) != CHANNELS:
+        raise ValueError(
+            f"{name} must be one number or one for each of red, green and "
+            f"blue, not {value!r}"
+        )
+    return tuple(value)
+
+
+class Calibration(NamedTuple):
+    """How each of the red, green and blue channels is corrected
+
+    Args:
+        gamma: each channel's gamma, above 1 darkens the low levels and
+            below 1 brightens them
+        white_point: the red, green and blue a full white is shown as, to
+            balance LEDs whose channels aren't equally bright
+        brightness: scales every channel, 0-1
+    """
+
+    gamma: Tuple[float, float, float] = (1, 1, 1)
+    white_point: Tuple[int, int, int] = (255, 255, 255)
+    brightness: float = 1
+
+    @classmethod
+    def load(cls, path: Path, brightness: float = 1) -> "Calibration":
+        """Read the gamma and white point from a calibration file
+
+        See `calibration.toml.example`. Either can be left out, and either
+        can be one number for all three channels.
+        """
+        with open(path, "rb") as f:
+            calibration = tomli.load(f)
+        return cls(
+            gamma=_per_channel(calibration.get("gamma", 1), "gamma"),
+            white_point=_per_channel(
+                calibration.get("white_point", 255), "white_point"
+            ),
+            brightness=brightness,
+        )
+
+    def levels(self) -> NDArray[np.float64]:
+        """What each value of each channel is shown as, before rounding
+
+        Returns:
+            NDArray[np.float64]: (CHANNELS * 256,) the red channel's levels,
+                then the green's and the blue's
+        """
+        values = np.arange(256) / 255
+        levels = np.empty((CHANNELS, 256))
+        for channel_levels, gamma, white in zip(
+            levels, self.gamma, self.white_point
+        ):
+            np.multiply(
+                values**gamma, white * self.brightness, out=channel_levels
+            )
+        return np.clip(levels, 0, 255).reshape(-1)
+
+    def tables(self) -> NDArray[np.uint8]:
+        """`levels` rounded to what the LEDs can show"""
+        return np.rint(self.levels()).astype(np.uint8)
@@ -0,0 +1,166 @@
+"""Record the Teensy's packets so they can be replayed without it.
+
+Records are written as they arrive, each with the monotonic time (relative to
+the start of the capture) it was read at.
+
+Args:
+    1: file to write the capture to
+    2: how many seconds to record for (default: until interrupted)
+"""
+
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import config, teensy_reciever
+
+CAPTURE_MAGIC = b"SACAPTUR"
+# magic, version, bins per record
+CAPTURE_HEADER = struct.Struct("<8sHH")
+CAPTURE_VERSION = 1
+
+
+def record_dtype(bin_count: int) -> np.dtype:
+    return np.dtype(
+        [
+            ("timestamp", "<f8"),
+            ("channel", "S1"),
+            ("id", "<u4"),
+            ("bins", "<f4", (bin_count,)),
+        ]
+    )
+
+
+def record(
+    packets: Iterator[teensy_reciever.Packet],
+    capture_file: BinaryIO,
+    duration: float | None = None,
+) -> int:
+    """Write packets to a capture file
+
+    The header is written once the first packet has arrived, as that is when
+    the bin count is known, so the file is left empty if none do.
+
+    Args:
+        packets: where packets come from, such as
+            `teensy_reciever.iter_packets`
+        capture_file: file to write to, opened in binary mode
+        duration: stop after this many seconds
+
+    Returns:
+        the number of records written
+    """
+    records_written = 0
+    start_time = time.monotonic()
+    for channel, id, raw_bins in packets:
+        timestamp = time.monotonic() - start_time
+
+        if not records_written:
+            capture_file.write(
+                CAPTURE_HEADER.pack(
+                    CAPTURE_MAGIC, CAPTURE_VERSION, len(raw_bins)
+                )
+            )
+            # reused for every record
+            record_array = np.zeros(1, dtype=record_dtype(len(raw_bins)))
+
+        record_array["timestamp"] = timestamp
+        record_array["channel"] = channel
+        record_array["id"] = id
+        record_array["bins"] = raw_bins
+        capture_file.write(record_array.tobytes())
+        records_written += 1
+
+        if duration is not None and timestamp >= duration:
+            break
+
+    return records_written
+
+
+def load(capture_path: Path) -> NDArray[np.void]:
+    """Memory map the records of a capture file
+
+    Raises:
+        ValueError: if it isn't a capture file, or has no records (nothing
+            arrived while it was recorded)
+    """
+    with open(capture_path, "rb") as capture_file:
+        header = capture_file.read(CAPTURE_HEADER.size)
+        if len(header) < CAPTURE_HEADER.size:
+            raise ValueError(
+                f"{capture_path} is empty, no packets were captured"
+            )
+        magic, version, bin_count = CAPTURE_HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise ValueError(f"{capture_path} is not a capture file")
+        dtype = record_dtype(bin_count)
+        # a record cut short by stopping the capture is left out
+        record_count = (
+            capture_file.seek(0, os.SEEK_END) - CAPTURE_HEADER.size
+        ) // dtype.itemsize
+    if not record_count:
+        raise ValueError(f"{capture_path} has no records")
+
+    return np.memmap(
+        capture_path,
+        dtype=dtype,
+        mode="r",
+        offset=CAPTURE_HEADER.size,
+        shape=(record_count,),
+    )
+
+
+def replay(
+    capture_path: Path, speed: float = 1
+) -> Iterator[teensy_reciever.Packet]:
+    """Replay the packets of a capture file
+
+    Args:
+        capture_path: the capture to replay
+        speed: how many times faster than it was recorded to replay the
+            capture, 0 replays it as fast as possible
+
+    Yields:
+        the same packets `teensy_reciever.iter_packets` would have
+    """
+    records = load(capture_path)
+    timestamps = records["timestamp"]
+    channels = records["channel"]
+    ids = records["id"]
+    bins = records["bins"]
+
+    start_time = time.monotonic()
+    for i in range(len(records)):
+        if speed:
+            delay = timestamps[i] / speed - (time.monotonic() - start_time)
+            if delay > 0:
+                time.sleep(delay)
+
+        yield channels[i].decode(), int(ids[i]), bins[i]
+
+
+def main(capture_path: Path, duration: float | None) -> None:
+    with teensy_reciever.open_port(config["serial_port"]) as teensy_port:
+        with open(capture_path, "wb") as capture_file:
+            try:
+                record(
+                    teensy_reciever.iter_packets(teensy_port),
+                    capture_file,
+                    duration,
+                )
+            except KeyboardInterrupt:
+                pass
+    print(f"capture written to {capture_path}")
+
+
+if __name__ == "__main__":
+    main(
+        capture_path=Path(sys.argv[1]),
+        duration=float(sys.argv[2]) if len(sys.argv) > 2 else None,
+    )
@@ -0,0 +1,56 @@
+"""Show levels between the ones the LEDs have by alternating between them."""
+
+import numpy as np
+from numpy.typing import NDArray
+
+# a level and the error carried into it are kept in fixed point with this
+# many fractional bits, the most that still fits in an int16 (255.99...)
+FRACTION_BITS = 7
+_FRACTION_MASK = (1 << FRACTION_BITS) - 1
+
+
+class TemporalDither:
+    """Carries what each byte is rounded off by into its next frame
+
+    A byte whose level is 10.25 is shown as 10 three frames and 11 the
+    fourth, so dim gradients keep their steps rather than collapsing into a
+    few. Each byte's error is kept in a preallocated int16 accumulator, so
+    dithering does not allocate.
+
+    Args:
+        levels: what each value is shown as before rounding, see
+            `calibration.Calibration.levels`
+        size: how many bytes are in each frame
+    """
+
+    def __init__(self, levels: NDArray[np.float64], size: int):
+        self._levels = np.rint(np.clip(levels, 0, 255) * (1 << FRACTION_BITS))
+        self._levels = self._levels.astype(np.int16)
+        self._frame_levels = np.empty(size, dtype=np.int16)
+        # each byte starts at a different point, so bytes of the same level
+        # don't all step up on the same frame and flicker together
+        self._errors = np.random.default_rng(0).integers(
+            0, 1 << FRACTION_BITS, size, dtype=np.int16
+        )
+
+    def __call__(
+        self, indexes: NDArray[np.intp], out: NDArray[np.uint8]
+    ) -> NDArray[np.uint8]:
+        """Look up each byte's level and round it to what is shown
+
+        Args:
+            indexes: which of `levels` each byte is
+            out: where to write the bytes
+
+        Returns:
+            NDArray[np.uint8]: `out`
+        """
+        frame_levels = self._frame_levels
+        errors = self._errors
+        np.take(self._levels, indexes, out=frame_levels, mode="clip")
+        # at most 255 and all the fractional bits, so it can't overflow
+        np.add(frame_levels, errors, out=frame_levels)
+        np.bitwise_and(frame_levels, _FRACTION_MASK, out=errors)
+        np.right_shift(frame_levels, FRACTION_BITS, out=frame_levels)
+        np.copyto(out, frame_levels, casting="unsafe")
+        return out
@@ -91,7 +91,7 @@ class EmulatedLEDWall(arcade.Window):
             pass
 
         while not self._frame_queue.empty():
-            newest_frame = self._frame_queue.get()
+            newest_frame, _ = self._frame_queue.get()
 
         assert newest_frame.shape == (
             self._matrix_height,
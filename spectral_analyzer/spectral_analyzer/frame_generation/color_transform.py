@@ -0,0 +1,241 @@
+"""Shift the hue, saturation and value of whole arrays of colors at once."""
+
+import functools
+import sys
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+class ColorTransform(NamedTuple):
+    """How to change colors, hashable so results can be cached by it
+
+    Args:
+        hue_shift: in turns (1 is all the way around)
+        saturation: multiplies the saturation
+        value: multiplies the value (brightness)
+        gamma: applied to each channel after the rest, above 1 darkens the
+            midtones
+    """
+
+    hue_shift: float = 0
+    saturation: float = 1
+    value: float = 1
+    gamma: float = 1
+
+    @property
+    def is_identity(self) -> bool:
+        return self == IDENTITY
+
+
+IDENTITY = ColorTransform()
+
+# where each of the red, green, blue and alpha bytes are in a pixel read as
+# a uint32
+_BYTE_SHIFTS = [
+    np.uint32(8 * (byte if sys.byteorder == "little" else 3 - byte))
+    for byte in range(4)
+]
+_CHANNEL_SHIFTS = _BYTE_SHIFTS[:3]
+_CHANNEL_MASK = np.uint32(0xFF)
+_ALPHA_MASK = _CHANNEL_MASK << _BYTE_SHIFTS[3]
+
+
+class ColorTransformer:
+    """Applies `ColorTransform`s to RGBA colors of one shape
+
+    The colors are converted to HSV and back in float32, a plane per channel
+    and without branching per pixel. Everything is allocated up front, so
+    transforming does not allocate.
+
+    Args:
+        shape: the shape of the colors, (..., 4)
+    """
+
+    def __init__(self, shape: Tuple[int, ...]):
+        if shape[-1] != 4:
+            raise ValueError(f"colors must be RGBA, not {shape}")
+        self.shape = shape
+        plane_shape = shape[:-1]
+        self._rgb = np.empty((3, *plane_shape), dtype=np.float32)
+        self._hue = np.empty(plane_shape, dtype=np.float32)
+        self._saturation = np.empty(plane_shape, dtype=np.float32)
+        self._value = np.empty(plane_shape, dtype=np.float32)
+        self._scratch = np.empty((3, *plane_shape), dtype=np.float32)
+        self._mask = np.empty(plane_shape, dtype=np.bool_)
+        # a pixel per element
+        self._packed = np.empty(plane_shape, dtype=np.uint32)
+        self._channel = np.empty(plane_shape, dtype=np.uint32)
+
+    def _unpack(self, colors: NDArray[np.uint8]) -> None:
+        """Copy each of the colors' channels into its plane of `_rgb`"""
+        # shifting and masking whole pixels is much faster than copying
+        # every fourth byte
+        packed = colors.view(np.uint32)[..., 0]
+        channel = self._channel
+        for plane, shift in zip(self._rgb, _CHANNEL_SHIFTS):
+            np.right_shift(packed, shift, out=channel)
+            np.bitwise_and(channel, _CHANNEL_MASK, out=channel)
+            np.copyto(plane, channel)
+
+    def _pack(self, colors: NDArray[np.uint8], out: NDArray[np.uint8]) -> None:
+        """Write `_rgb` and the colors' alpha to `out`"""
+        packed = self._packed
+        channel = self._channel
+        np.bitwise_and(colors.view(np.uint32)[..., 0], _ALPHA_MASK, out=packed)
+        for plane, shift in zip(self._rgb, _CHANNEL_SHIFTS):
+            np.copyto(channel, plane, casting="unsafe")
+            np.left_shift(channel, shift, out=channel)
+            np.bitwise_or(packed, channel, out=packed)
+        np.copyto(out.view(np.uint32)[..., 0], packed)
+
+    def _select(self, condition: NDArray[np.bool_], choice, chosen) -> None:
+        """Replace `chosen` with `choice` where `condition` is true
+
+        Multiplies by the condition, as `np.copyto` with `where` is several
+        times slower.
+        """
+        weight = self._scratch[2]
+        np.copyto(weight, condition)
+        np.multiply(choice, weight, out=choice)
+        np.logical_not(condition, out=condition)
+        np.copyto(weight, condition)
+        np.multiply(chosen, weight, out=chosen)
+        np.add(chosen, choice, out=chosen)
+
+    def _to_hsv(self) -> None:
+        """Convert `_rgb` to `_hue`, `_saturation` and `_value`
+
+        The same as `colorsys.rgb_to_hsv`, except the hue is in sixths of a
+        turn from -1 to 5 and the value is 0-255.
+        """
+        red, green, blue = self._rgb
+        hue = self._hue
+        saturation = self._saturation
+        value = self._value
+        chroma, scratch, _ = self._scratch
+        mask = self._mask
+
+        np.maximum(red, green, out=value)
+        np.maximum(value, blue, out=value)
+        np.minimum(red, green, out=chroma)
+        np.minimum(chroma, blue, out=chroma)
+        np.subtract(value, chroma, out=chroma)
+
+        # the channels are whole numbers, so a chroma (or value) of 0 is the
+        # only one under 1, and then whatever is divided by it is 0 too
+        np.maximum(value, 1, out=scratch)
+        np.divide(chroma, scratch, out=saturation)
+        np.maximum(chroma, 1, out=chroma)
+
+        # the hue is measured from whichever channel is brightest, red first
+        # then green
+        np.subtract(red, green, out=hue)
+        np.divide(hue, chroma, out=hue)
+        np.add(hue, 4, out=hue)
+        np.subtract(blue, red, out=scratch)
+        np.divide(scratch, chroma, out=scratch)
+        np.add(scratch, 2, out=scratch)
+        np.equal(green, value, out=mask)
+        self._select(mask, scratch, hue)
+        np.subtract(green, blue, out=scratch)
+        np.divide(scratch, chroma, out=scratch)
+        np.equal(red, value, out=mask)
+        self._select(mask, scratch, hue)
+
+    def _to_rgb(self, hue_shift: float) -> None:
+        """Convert `_hue` shifted by `hue_shift` turns, `_saturation` and
+        `_value` back to `_rgb`
+        """
+        hue = self._hue
+        saturation = self._saturation
+        value = self._value
+        k, rising, falling = self._scratch
+
+        # each channel is the value less however much of the chroma its
+        # distance around the hue circle takes off it. k stays within -1 to
+        # 11, so rather than wrap it, the falling side of the next turn is
+        # taken too
+        for channel, offset in zip(self._rgb, (5, 3, 1)):
+            np.add(hue, (offset + hue_shift * 6) % 6, out=k)
+            np.subtract(4, k, out=rising)
+            np.minimum(k, rising, out=rising)
+            np.subtract(10, k, out=falling)
+            np.subtract(k, 6, out=k)
+            np.minimum(k, falling, out=falling)
+            np.maximum(rising, falling, out=k)
+            np.maximum(k, 0, out=k)
+            np.minimum(k, 1, out=k)
+            np.multiply(k, saturation, out=k)
+            np.multiply(k, value, out=k)
+            np.subtract(value, k, out=channel)
+
+    def __call__(
+        self,
+        colors: NDArray[np.uint8],
+        transform: ColorTransform,
+        out: NDArray[np.uint8] | None = None,
+    ) -> NDArray[np.uint8]:
+        """Transform the colors
+
+        Args:
+            colors: contiguous RGBA colors of `shape`
+            transform: what to change
+            out: a contiguous array of `shape` to write the colors into,
+                rather than a new one. It can be `colors`.
+
+        Returns:
+            NDArray[np.uint8]: the transformed colors, with alpha unchanged
+        """
+        if colors.shape != self.shape:
+            raise ValueError(
+                f"colors must be {self.shape}, not {colors.shape}"
+            )
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        if transform.is_identity:
+            np.copyto(out, colors)
+            return out
+
+        rgb = self._rgb
+        self._unpack(colors)
+        self._to_hsv()
+
+        if transform.saturation != 1:
+            saturation = self._saturation
+            np.multiply(saturation, transform.saturation, out=saturation)
+            np.minimum(saturation, 1, out=saturation)
+            np.maximum(saturation, 0, out=saturation)
+        if transform.value != 1:
+            value = self._value
+            np.multiply(value, transform.value, out=value)
+            np.minimum(value, 255, out=value)
+            np.maximum(value, 0, out=value)
+
+        self._to_rgb(transform.hue_shift)
+
+        if transform.gamma != 1:
+            np.multiply(rgb, 1 / 255, out=rgb)
+            np.power(rgb, transform.gamma, out=rgb)
+            np.multiply(rgb, 255, out=rgb)
+
+        np.rint(rgb, out=rgb)
+        self._pack(colors, out)
+        return out
+
+
+@functools.lru_cache(maxsize=8)
+def _transformer(shape: Tuple[int, ...]) -> ColorTransformer:
+    return ColorTransformer(shape)
+
+
+def transform_colors(
+    colors: NDArray[np.uint8], transform: ColorTransform
+) -> NDArray[np.uint8]:
+    """Transform RGBA colors of any shape, see `ColorTransformer`
+
+    Returns:
+        NDArray[np.uint8]: new transformed colors
+    """
+    return _transformer(colors.shape)(np.ascontiguousarray(colors), transform)
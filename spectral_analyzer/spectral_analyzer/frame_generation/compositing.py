@@ -0,0 +1,185 @@
+"""Draw several styles over each other as one frame."""
+
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import registry
+
+if TYPE_CHECKING:
+    from .display_styles import Style
+
+# blending weights are out of this, so a weight fits in 9 bits and a
+# weighted 8 bit channel in 16
+_OPAQUE = 256
+
+# a pixel's four channels are blended as the 16 bit lanes of one uint64, as
+# every channel of a pixel has the same weight and no lane can carry into
+# the next. these are where the alpha lane is and a mask of each lane's low
+# byte
+_ALPHA_SHIFT = np.uint64(48 if sys.byteorder == "little" else 0)
+_OPAQUE_ALPHA = np.uint64(255) << _ALPHA_SHIFT
+_LOW_BYTES = np.uint64(0x00FF00FF00FF00FF)
+
+
+class Compositor:
+    """Renders each layer and draws them over each other, bottom layer first
+
+    Blending is done in 8.8 fixed point: each layer's pixels are weighted by
+    their alpha (scaled by the layer's opacity) out of 256 and added to the
+    rest of what is under them, which always fits in 16 bits. A fully
+    opaque pixel replaces what is under it exactly, so a style drawn alone
+    comes out just as it would without compositing.
+
+    Everything is allocated up front, so compositing does not allocate.
+    Takes the same arguments as a `Style`, so it can be used in place of
+    one.
+
+    Args:
+        layers: each layer's style and opacity (0-1), bottom layer first
+    """
+
+    def __init__(self, layers: Sequence[Tuple["Style", float]]):
+        if not layers:
+            raise ValueError("there must be at least one layer")
+        self._styles = [style for style, _ in layers]
+        self.frame_shape = self._styles[0].frame_shape
+        for style in self._styles:
+            if style.frame_shape != self.frame_shape:
+                raise ValueError(
+                    f"layers must all be {self.frame_shape}, "
+                    f"not {style.frame_shape}"
+                )
+        # out of `_OPAQUE`
+        self._opacities = [
+            np.uint64(round(min(max(opacity, 0), 1) * _OPAQUE))
+            for _, opacity in layers
+        ]
+
+        self._layer_frames = np.zeros(
+            (len(layers), *self.frame_shape), dtype=np.uint8
+        )
+        self._accumulator = np.zeros(self.frame_shape, dtype=np.uint16)
+        self._pixels = np.empty(self.frame_shape, dtype=np.uint16)
+        # a pixel per element
+        pixel_shape = self.frame_shape[:2]
+        self._packed_accumulator = self._accumulator.view(np.uint64)[:, :, 0]
+        self._packed_pixels = self._pixels.view(np.uint64)[:, :, 0]
+        self._weights = np.empty(pixel_shape, dtype=np.uint64)
+        self._inverse_weights = np.empty(pixel_shape, dtype=np.uint64)
+        self._scratch = np.empty(pixel_shape, dtype=np.uint64)
+
+    @classmethod
+    def from_config(
+        cls,
+        width: int,
+        height: int,
+        layers: Sequence[Dict[str, Any]],
+        gradient_str: str,
+        gradient_direction: str = "vertical",
+    ) -> "Compositor":
+        """Build the layers described in `config.toml`
+
+        Args:
+            layers: each layer's `style`, and optionally its `gradient`
+                (default: `gradient_str`), `gradient_direction` (default:
+                `gradient_direction`) and `opacity` (default: 1)
+            gradient_str: the gradient of layers that don't name one
+            gradient_direction: the gradient direction of layers that don't
+                name one
+        """
+        return cls(
+            [
+                (
+                    registry.styles[layer["style"]](
+                        width=width,
+                        height=height,
+                        gradient_str=layer.get("gradient", gradient_str),
+                        gradient_direction=layer.get(
+                            "gradient_direction", gradient_direction
+                        ),
+                    ),
+                    layer.get("opacity", 1),
+                )
+                for layer in layers
+            ]
+        )
+
+    @property
+    def each_channel_width(self) -> int:
+        return self._styles[0].each_channel_width
+
+    def _blend(self, layer_frame: NDArray[np.uint8], layer: int) -> None:
+        """Draw a layer's frame over the accumulator"""
+        pixels = self._packed_pixels
+        weights = self._weights
+        inverse_weights = self._inverse_weights
+        scratch = self._scratch
+        accumulator = self._packed_accumulator
+        opacity = self._opacities[layer]
+
+        np.copyto(self._pixels, layer_frame)
+
+        # each pixel's weight is its alpha, 0-255 stretched to 0-256 so an
+        # opaque pixel replaces what is under it exactly
+        np.right_shift(pixels, _ALPHA_SHIFT, out=weights)
+        np.right_shift(weights, np.uint64(7), out=scratch)
+        np.add(weights, scratch, out=weights)
+        if opacity != _OPAQUE:
+            np.multiply(weights, opacity, out=weights)
+            np.right_shift(weights, np.uint64(8), out=weights)
+        np.subtract(np.uint64(_OPAQUE), weights, out=inverse_weights)
+
+        # the alpha is already in the weight, so it covers the frame fully
+        np.bitwise_or(pixels, _OPAQUE_ALPHA, out=pixels)
+        # every lane is at most 255 * 256 after weighting, and so is their
+        # sum as the weights add up to 256
+        np.multiply(pixels, weights, out=pixels)
+        np.multiply(accumulator, inverse_weights, out=accumulator)
+        np.add(accumulator, pixels, out=accumulator)
+        np.right_shift(accumulator, np.uint64(8), out=accumulator)
+        np.bitwise_and(accumulator, _LOW_BYTES, out=accumulator)
+
+    def __call__(
+        self,
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.uint8] | None = None,
+        left_peaks: NDArray[np.floating] | None = None,
+        right_peaks: NDArray[np.floating] | None = None,
+    ) -> NDArray[np.uint8]:
+        """Render every layer and composite them into a frame
+
+        Args:
+            left_channel: the left channel's bin energies
+            right_channel: the right channel's bin energies
+            out: a contiguous frame of `frame_shape` to render into, rather
+                than a new one
+            left_peaks: the left channel's peak energies, marked by every
+                layer
+            right_peaks: the right channel's peak energies
+
+        Returns:
+            NDArray[np.uint8]: the frame
+        """
+        if out is None:
+            out = np.empty(self.frame_shape, dtype=np.uint8)
+
+        self._accumulator.fill(0)
+        for layer, (style, layer_frame) in enumerate(
+            zip(self._styles, self._layer_frames)
+        ):
+            style(
+                left_channel,
+                right_channel,
+                layer_frame,
+                left_peaks,
+                right_peaks,
+            )
+            self._blend(layer_frame, layer)
+
+        # every channel is at most 255 by now
+        np.copyto(out, self._accumulator, casting="unsafe")
+        return out
@@ -1,13 +1,48 @@
 import abc
+import functools
 import math
 import time
-from typing import Dict, Type
+from typing import Tuple
 
 import numpy as np
-from numpy.typing import NDArray
+from numpy.typing import ArrayLike, NDArray
 
 from .. import config
-from . import gradient
+from . import color_transform, gradient
+
+# how many hues `ShiftingHue` cycles through
+HUE_STEPS = 256
+# the most memory `ShiftingHue` keeps the columns of each hue in, fewer hues
+# are kept for taller matrices
+HUE_CACHE_BYTES = 16 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def resampling_matrix(bin_count: int, width: int) -> NDArray[np.float32]:
+    """Weights that resample `bin_count` bins to `width` columns
+
+    Each column is the mean of the bins it spans, weighted by how much of
+    each bin it covers, so a loud bin stays as loud whether it is spread
+    over several columns or shares one with its neighbours.
+
+    Args:
+        bin_count: how many bins there are
+        width: how many columns to make
+
+    Returns:
+        (bin_count, width) weights, so `bins @ weights` are the columns
+    """
+    # where each column starts and ends, measured in bins
+    column_edges = np.linspace(0, bin_count, width + 1)
+    bin_starts = np.arange(bin_count)[:, None]
+    overlap = np.minimum(bin_starts + 1, column_edges[1:]) - np.maximum(
+        bin_starts, column_edges[:-1]
+    )
+    weights = np.clip(overlap, 0, None) * (width / bin_count)
+    weights = weights.astype(np.float32)
+    # it is shared through the cache
+    weights.setflags(write=False)
+    return weights
 
 
 class Style(abc.ABC):
@@ -16,7 +51,13 @@ class Style(abc.ABC):
         width: int,
         height: int,
         gradient_str: str,
+        gradient_direction: str = "vertical",
     ):
+        if gradient_direction not in gradient.DIRECTIONS:
+            raise ValueError(
+                f"gradient_direction must be one of {gradient.DIRECTIONS}, "
+                f"not {gradient_direction!r}"
+            )
         self._width = width
         self._height = height
         self._half_height = math.ceil(self._height / 2)
@@ -29,249 +70,501 @@ class Style(abc.ABC):
             self._each_channel_width = int(self._width / 2)
 
         self._gradient_str = gradient_str
+        # the way the gradient runs across the bars: "vertical" from their
+        # base to their top, "horizontal" from the lowest bin out to the
+        # highest, "diagonal" both at once, or "per_column" up each bar with
+        # its hue shifted by how far out it is
+        self._gradient_direction = gradient_direction
 
         self._setup()
 
+    @property
+    def each_channel_width(self) -> int:
+        """How many columns each channel's bars take up"""
+        return self._each_channel_width
+
+    @property
+    def frame_shape(self) -> Tuple[int, int, int]:
+        """The shape of the frames this style renders"""
+        return (len(self._row_distances), 2 * self._each_channel_width, 4)
+
     def _setup(self) -> None:
         self._get_gradient(self._gradient_str)
+        self._bar_height = self._get_bar_height()
+        self._row_distances = self._get_row_distances()
+        self._allocate_buffers()
+        self._column_table = self._build_column_table()
+
+    def _allocate_buffers(self) -> None:
+        """Allocate everything rendering needs, so frames allocate nothing"""
+        rows, columns, _ = self.frame_shape
+        self._scaled_bins = np.empty(self._each_channel_width)
+        self._levels = np.empty(columns, dtype=np.intp)
+        # which of a column's rows are lit, for each level it can be at
+        self._lit_by_level = self._row_distances[:, None] < np.arange(
+            self._bar_height + 1
+        )
+        self._lit = np.empty((rows, columns), dtype=np.bool_)
 
-    def _get_gradient(self, gradient_str: str):
-        self._gradient_stops = gradient.svg_to_gradient(gradient_str)
-        self._gradient_array = gradient.gen_gradient(
-            self._height, self._gradient_stops
+        # peak markers are the top pixel of a bar as tall as the peak
+        self._marker_by_level = self._row_distances[:, None] == (
+            np.arange(self._bar_height + 1) - 1
         )
+        self._peak_levels = np.empty(columns, dtype=np.intp)
+        self._peak_pixels = np.empty((rows, columns), dtype=np.uint32)
+        self._peak_markers = np.empty((rows, columns), dtype=np.bool_)
 
-    def _shift_gradient(self, hue_shift=float):
-        new_stops = []
-        for i, stop in enumerate(self._gradient_stops):
-            new_stops.append(
-                (
-                    stop[0],
-                    gradient.shift_hue(stop[1], hue_shift),
-                )
+    @property
+    def _colors_each_pixel(self) -> bool:
+        """Whether the column table is the color of each pixel of the frame
+
+        Only gradients that run up the bars can be drawn whole columns at a
+        time, others color each pixel where the bars reach it.
+        """
+        return self._gradient_direction != "vertical"
+
+    def _build_column_table(
+        self,
+        transform: color_transform.ColorTransform = color_transform.IDENTITY,
+    ) -> NDArray[np.uint32]:
+        """Draw every column the bars can make, one for each level
+
+        Each RGBA pixel is packed into a uint32, so they are copied whole.
+
+        Args:
+            transform: how to change the gradient's colors
+
+        Returns:
+            NDArray[np.uint32]: a new column table
+        """
+        if self._colors_each_pixel:
+            return self._build_pixel_table(transform)
+
+        gradient_array = self._gradient_array
+        if not transform.is_identity:
+            gradient_array = gradient.rasterize(
+                self._gradient_str, len(gradient_array), transform
             )
-        self._gradient_array = gradient.gen_gradient(self._height, new_stops)
+        pixels = gradient_array.view(np.uint32)[:, 0]
+        column_table = np.zeros(self._lit_by_level.shape, dtype=np.uint32)
+        np.copyto(
+            column_table, self._bar_colors(pixels), where=self._lit_by_level
+        )
+        return column_table
+
+    def _build_pixel_table(
+        self, transform: color_transform.ColorTransform
+    ) -> NDArray[np.uint32]:
+        """Color each pixel of the frame by where it is in its bar
+
+        A 2D gradient as tall as the gradient and as wide as a channel is
+        laid over the bars, so both channels' bars match.
+        """
+        channel_width = self._each_channel_width
+        pixels = gradient.rasterize(
+            self._gradient_str,
+            len(self._gradient_array),
+            transform,
+            width=channel_width,
+            direction=self._gradient_direction,
+        ).view(np.uint32)[:, :, 0]
+        # the left channel is mirrored
+        bar_columns = np.concatenate(
+            (np.arange(channel_width)[::-1], np.arange(channel_width))
+        )
+        return pixels[self._row_distances[:, None], bar_columns]
+
+    def _get_bar_height(self) -> int:
+        """The most pixels a bar can light"""
+        return self._height
 
     @abc.abstractmethod
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        """How far each row of the frame is from the base of its bars"""
+
+    def _get_gradient(self, gradient_str: str):
+        self._gradient_array = gradient.rasterize(gradient_str, self._height)
+
     def _generate_frame(
         self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.uint8],
     ) -> NDArray[np.uint8]:
-        pass
+        return self._generate_bars(left_channel, right_channel, out)
 
     def __call__(
         self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.uint8] | None = None,
+        left_peaks: NDArray[np.floating] | None = None,
+        right_peaks: NDArray[np.floating] | None = None,
+    ) -> NDArray[np.uint8]:
+        """Render a frame
+
+        Args:
+            left_channel: the left channel's bin energies
+            right_channel: the right channel's bin energies
+            out: a contiguous frame of `frame_shape` to render into, rather
+                than a new one
+            left_peaks: the left channel's peak energies, to mark above the
+                bars (see `smoothing.Smoother`)
+            right_peaks: the right channel's peak energies
+
+        Returns:
+            NDArray[np.uint8]: the frame
+        """
+        if out is None:
+            out = np.empty(self.frame_shape, dtype=np.uint8)
+        frame = self._generate_frame(left_channel, right_channel, out)
+        if left_peaks is not None and right_peaks is not None:
+            self._draw_peaks(left_peaks, right_peaks, frame)
+        return frame
+
+    def render_batch(
+        self,
+        left_channels: NDArray[np.floating],
+        right_channels: NDArray[np.floating],
+        times: NDArray[np.float64] | None = None,
+        left_peaks: NDArray[np.floating] | None = None,
+        right_peaks: NDArray[np.floating] | None = None,
     ) -> NDArray[np.uint8]:
-        return self._generate_frame(left_channel, right_channel)
+        """Render many frames at once
+
+        For when frames don't have to be shown as they are rendered, like
+        exporting video or replaying a capture. Each frame is the same as
+        `__call__` would have rendered.
+
+        Args:
+            left_channels: (frames, bins) the left channel's bin energies
+            right_channels: (frames, bins) the right channel's bin energies
+            times: (frames,) the `time.monotonic()` of each frame, for the
+                styles that change over time (default: now)
+            left_peaks: (frames, bins) the left channel's peak energies
+            right_peaks: (frames, bins) the right channel's peak energies
+
+        Returns:
+            NDArray[np.uint8]: the frames, with dimensions
+                (frames, height, width, 4)
+        """
+        frame_count = len(left_channels)
+        if times is None:
+            times = np.full(frame_count, time.monotonic())
+
+        levels = self._get_batch_levels(left_channels, right_channels)
+        column_tables, table_indexes = self._get_column_tables(
+            np.asarray(times)
+        )
+        if self._colors_each_pixel:
+            return self._render_pixel_batch(
+                levels,
+                column_tables[table_indexes],
+                left_peaks,
+                right_peaks,
+            )
+
+        # gather whole columns, then turn them into rows
+        columns_by_level = np.ascontiguousarray(
+            column_tables.transpose(0, 2, 1)
+        )
+        frame_columns = columns_by_level[table_indexes[:, None], levels]
+        if left_peaks is not None and right_peaks is not None:
+            peak_levels = self._get_batch_levels(left_peaks, right_peaks)
+            np.copyto(
+                frame_columns,
+                columns_by_level[table_indexes[:, None], peak_levels],
+                where=self._marker_by_level.T[peak_levels],
+            )
+        frame_pixels = np.ascontiguousarray(frame_columns.transpose(0, 2, 1))
+        return frame_pixels.view(np.uint8).reshape((*frame_pixels.shape, 4))
+
+    def _render_pixel_batch(
+        self,
+        levels: NDArray[np.intp],
+        pixel_colors: NDArray[np.uint32],
+        left_peaks: NDArray[np.floating] | None,
+        right_peaks: NDArray[np.floating] | None,
+    ) -> NDArray[np.uint8]:
+        """`render_batch` for styles that color each pixel
+
+        Args:
+            levels: (frames, width) the level of every column
+            pixel_colors: (frames, height, width) the column table of each
+                frame
+        """
+        lit = self._lit_by_level[:, levels].transpose(1, 0, 2)
+        frame_pixels = np.where(lit, pixel_colors, np.uint32(0))
+        if left_peaks is not None and right_peaks is not None:
+            peak_levels = self._get_batch_levels(left_peaks, right_peaks)
+            np.copyto(
+                frame_pixels,
+                pixel_colors,
+                where=self._marker_by_level[:, peak_levels].transpose(1, 0, 2),
+            )
+        return frame_pixels.view(np.uint8).reshape((*frame_pixels.shape, 4))
+
+    def _get_column_tables(
+        self, times: NDArray[np.float64]
+    ) -> Tuple[NDArray[np.uint32], NDArray[np.intp]]:
+        """The column tables frames at the given times are drawn from
+
+        Returns:
+            the column tables, stacked, and which of them each frame uses
+        """
+        return self._column_table[None], np.zeros(len(times), dtype=np.intp)
 
     def _reshape_bin_rms_array(
         self,
-        bin_rms_array: NDArray[np.float64],
+        bin_rms_array: NDArray[np.floating],
         width: int,
-    ) -> NDArray[np.float64]:
+        out: NDArray[np.floating] | None = None,
+    ) -> NDArray[np.floating]:
         """Reshapes the bin array to be equal to the width.
 
         Maintains relative intensity.
 
         This should not be nessesary (idealy len(bin_rms_array) == width)
+
+        The bins are in the last axis, so many frames can be reshaped at once.
         """
-        if not len(bin_rms_array) == width:
+        bin_count = np.shape(bin_rms_array)[-1]
+        if bin_count == width:
             # no need to reshape if the size is already correct (duh)
             return bin_rms_array
 
-        # find the lowest common multiple bin
-        common_multiple_bin_rms_array = np.repeat(
-            bin_rms_array, repeats=width
-        ).reshape((width, len(bin_rms_array)))
-        # crunch it back down to `width` size
-        reshaped_bin_rms_array = np.mean(common_multiple_bin_rms_array, axis=1)
-        assert len(reshaped_bin_rms_array) == width
-        return reshaped_bin_rms_array
+        return np.matmul(
+            bin_rms_array, resampling_matrix(bin_count, width), out=out
+        )
 
-    def _generate_bar_graph(
+    def _get_bar_levels(
         self,
-        width: int,
-        height: int,
-        bin_rms_array: NDArray[np.float64],
-        gradient_array: NDArray[np.uint8],
-    ) -> NDArray[np.uint8]:
-        """Turn each bin of a bin_rms_array into a bar graph
+        bin_rms_array: NDArray[np.floating],
+        out: NDArray[np.intp],
+    ) -> NDArray[np.intp]:
+        """How many pixels of each of a channel's columns are lit
 
         One audio channel at a time
 
-        `width` and `height` are typically not `self._width` nor `self._height`
-            due to displaying multiple graphs at once
-
         Args:
-            width: width of the graph in pixels
-            height: height of graph in pixels
             bin_rms_array: array of bin energies
+            out: where to put the lit pixels of each column, between 0 and
+                the bar height
 
         Returns:
-            NDArray[np.uint8]: uint8 ndarray with dimensions (width, height, 4)
+            NDArray[np.intp]: `out`
         """
+        width = self._each_channel_width
+        scaled_bins = self._scaled_bins
         if not width == len(bin_rms_array):
-            bin_rms_array = self._reshape_bin_rms_array(bin_rms_array, width)
-
-        bar_graph = np.zeros((height, width, 4), dtype=np.uint8)
-
-        for i, energy in enumerate(bin_rms_array):
-            if not energy:
-                bar_height = 0
-            else:
-                bar_height = int(energy * height)
-
-            bar_graph[0:bar_height, i, :] = gradient_array[0:bar_height, :]
-
-        return np.flipud(bar_graph)
+            bin_rms_array = self._reshape_bin_rms_array(
+                bin_rms_array, width, out=scaled_bins
+            )
 
+        np.multiply(bin_rms_array, self._bar_height, out=scaled_bins)
+        np.clip(scaled_bins, 0, self._bar_height, out=scaled_bins)
+        # truncated, like `int()`
+        np.copyto(out, scaled_bins, casting="unsafe")
+        return out
 
-class BottomUp(Style):
-    def _generate_frame(
+    def _get_batch_levels(
         self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
-    ) -> NDArray[np.uint8]:
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            left_channel,
-            self._gradient_array,
+        left_channels: NDArray[np.floating],
+        right_channels: NDArray[np.floating],
+    ) -> NDArray[np.intp]:
+        """`_get_levels` for (frames, bins) bin energies"""
+        channel_width = self._each_channel_width
+        levels = np.empty(
+            (len(left_channels), 2 * channel_width), dtype=np.intp
         )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            right_channel,
-            self._gradient_array,
+        levels[:, channel_width - 1 :: -1] = self._get_batch_bar_levels(
+            left_channels
         )
+        levels[:, channel_width:] = self._get_batch_bar_levels(right_channels)
+        return levels
+
+    def _get_batch_bar_levels(
+        self, bin_rms_arrays: NDArray[np.floating]
+    ) -> NDArray[np.intp]:
+        """`_get_bar_levels` for (frames, bins) bin energies"""
+        bin_rms_arrays = np.asarray(bin_rms_arrays)
+        width = self._each_channel_width
+        if not width == bin_rms_arrays.shape[1]:
+            # in float64, as `_get_bar_levels` does
+            bin_rms_arrays = self._reshape_bin_rms_array(
+                bin_rms_arrays,
+                width,
+                out=np.empty((len(bin_rms_arrays), width)),
+            )
+        levels = np.clip(
+            bin_rms_arrays * self._bar_height, 0, self._bar_height
+        )
+        return levels.astype(np.intp)
 
-        left_graph = np.fliplr(left_graph)
-        frame = np.concatenate((left_graph, right_graph), axis=1)
+    def _bar_colors(self, pixels: NDArray[np.uint32]) -> NDArray[np.uint32]:
+        """The color of every lit pixel, broadcastable to (height, levels)
 
-        frame = np.flipud(frame).copy()
+        Each row is the gradient's color at its distance from the base of
+        the bars.
 
-        return frame
+        Args:
+            pixels: the gradient, with each RGBA pixel packed into a uint32
+        """
+        return pixels[self._row_distances][:, None]
 
+    def _get_levels(
+        self,
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.intp],
+    ) -> NDArray[np.intp]:
+        """The levels of every column of the frame
 
-class PerBinColor(Style):
-    def _generate_frame(
+        The left channel is mirrored, so the lowest bins meet in the middle.
+        """
+        channel_width = self._each_channel_width
+        self._get_bar_levels(left_channel, out[channel_width - 1 :: -1])
+        self._get_bar_levels(right_channel, out[channel_width:])
+        return out
+
+    def _draw_peaks(
         self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
-    ) -> NDArray[np.uint8]:
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            left_channel,
-            self._gradient_array,
+        left_peaks: NDArray[np.floating],
+        right_peaks: NDArray[np.floating],
+        out: NDArray[np.uint8],
+    ) -> None:
+        """Mark each column's peak over a rendered frame"""
+        peak_levels = self._get_levels(
+            left_peaks, right_peaks, self._peak_levels
         )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            right_channel,
-            self._gradient_array,
+        if self._colors_each_pixel:
+            peak_pixels = self._column_table
+        else:
+            peak_pixels = np.take(
+                self._column_table,
+                peak_levels,
+                axis=1,
+                out=self._peak_pixels,
+                mode="clip",
+            )
+        np.take(
+            self._marker_by_level,
+            peak_levels,
+            axis=1,
+            out=self._peak_markers,
+            mode="clip",
+        )
+        np.copyto(
+            out.view(np.uint32)[:, :, 0],
+            peak_pixels,
+            where=self._peak_markers,
         )
 
-        left_graph = np.fliplr(left_graph)
-        frame = np.concatenate((left_graph, right_graph), axis=1)
-
-        frame = np.flipud(frame).copy()
-
-        return frame
-
-    def _generate_bar_graph(
+    def _generate_bars(
         self,
-        width: int,
-        height: int,
-        bin_rms_array: NDArray[np.float64],
-        gradient_array: NDArray[np.uint8],
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.uint8],
     ) -> NDArray[np.uint8]:
-        """Turn each bin of a bin_rms_array into a bar graph
-
-        One audio channel at a time
+        """Draw the bars of both channels at once
 
-        `width` and `height` are typically not `self._width` nor `self._height`
-            due to displaying multiple graphs at once
-
-        Args:
-            width: width of the graph in pixels
-            height: height of graph in pixels
-            bin_rms_array: array of bin energies
+        Each column is copied from the column table, by its level.
 
         Returns:
-            NDArray[np.uint8]: uint8 ndarray with dimensions (width, height, 4)
+            NDArray[np.uint8]: `out`, with dimensions (height, width, 4)
         """
-        if not width == len(bin_rms_array):
-            bin_rms_array = self._reshape_bin_rms_array(bin_rms_array, width)
+        levels = self._get_levels(left_channel, right_channel, self._levels)
+        if self._colors_each_pixel:
+            np.take(
+                self._lit_by_level,
+                levels,
+                axis=1,
+                out=self._lit,
+                mode="clip",
+            )
+            frame_pixels = out.view(np.uint32)[:, :, 0]
+            frame_pixels.fill(0)
+            np.copyto(frame_pixels, self._column_table, where=self._lit)
+            return out
+
+        np.take(
+            self._column_table,
+            levels,
+            axis=1,
+            out=out.view(np.uint32)[:, :, 0],
+            mode="clip",
+        )
+        return out
 
-        bar_graph = np.zeros((height, width, 4), dtype=np.uint8)
 
-        for i, energy in enumerate(bin_rms_array):
-            if not energy:
-                bar_height = 0
-            else:
-                bar_height = int(energy * height)
+class BottomUp(Style):
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        # the LED wall shows frames upside down
+        return np.arange(self._height)
 
-            bar_graph[0:bar_height, i, :] = gradient_array[bar_height - 1]
 
-        return np.flipud(bar_graph)
+class PerBinColor(BottomUp):
+    def _setup(self) -> None:
+        if self._colors_each_pixel:
+            raise ValueError("per_bin_color colors whole bars at a time")
+        super()._setup()
 
+    def _bar_colors(self, pixels: NDArray[np.uint32]) -> NDArray[np.uint32]:
+        """Each bar is the gradient's color at the top of it"""
+        # level 0 wraps around to the last color, but is never lit
+        return pixels[np.arange(self._bar_height + 1) - 1]
 
-class ShiftingHue(Style):
-    def _generate_frame(
-        self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
-    ) -> NDArray[np.uint8]:
-        self._shift_gradient((time.monotonic() / 10) % 1)
 
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            left_channel,
-            self._gradient_array,
-        )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            right_channel,
-            self._gradient_array,
-        )
+def _hue_steps(times: ArrayLike) -> NDArray[np.intp]:
+    """Which of the `HUE_STEPS` hues `ShiftingHue` shows at each time"""
+    # all the way around every 10 seconds
+    hue_shifts = np.asarray(times) / 10 % 1
+    return (hue_shifts * HUE_STEPS).astype(np.intp) % HUE_STEPS
 
-        left_graph = np.fliplr(left_graph)
-        frame = np.concatenate((left_graph, right_graph), axis=1)
 
-        # frame = np.flipud(frame).copy()
+class ShiftingHue(Style):
+    def _setup(self) -> None:
+        super()._setup()
+        self._hue_column_table = functools.lru_cache(
+            maxsize=min(
+                HUE_STEPS,
+                max(1, HUE_CACHE_BYTES // self._column_table.nbytes),
+            )
+        )(self._build_hue_column_table)
 
-        return frame
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        return np.arange(self._height)[::-1]
 
+    def _build_hue_column_table(self, hue_step: int) -> NDArray[np.uint32]:
+        return self._build_column_table(
+            color_transform.ColorTransform(hue_shift=hue_step / HUE_STEPS)
+        )
 
-class TopDown(Style):
     def _generate_frame(
         self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
+        left_channel: NDArray[np.floating],
+        right_channel: NDArray[np.floating],
+        out: NDArray[np.uint8],
     ) -> NDArray[np.uint8]:
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            left_channel,
-            self._gradient_array,
+        hue_step = int(_hue_steps(time.monotonic()))
+        self._column_table = self._hue_column_table(hue_step)
+        return self._generate_bars(left_channel, right_channel, out)
+
+    def _get_column_tables(
+        self, times: NDArray[np.float64]
+    ) -> Tuple[NDArray[np.uint32], NDArray[np.intp]]:
+        hue_steps, table_indexes = np.unique(
+            _hue_steps(times), return_inverse=True
         )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._height,
-            right_channel,
-            self._gradient_array,
+        column_tables = np.stack(
+            [self._hue_column_table(int(hue_step)) for hue_step in hue_steps]
         )
+        return column_tables, table_indexes.reshape(-1)
 
-        left_graph = np.fliplr(left_graph)
-        frame = np.concatenate((left_graph, right_graph), axis=1)
 
-        return frame
+class TopDown(Style):
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        return np.arange(self._height)[::-1]
 
 
 class CenterOut(Style):
@@ -280,32 +573,18 @@ class CenterOut(Style):
             gradient_str, self._half_height
         )
 
-    def _generate_frame(
-        self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
-    ) -> NDArray[np.uint8]:
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._half_height,
-            left_channel,
-            self._gradient_array,
-        )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._half_height,
-            right_channel,
-            self._gradient_array,
-        )
-
-        left_graph = np.fliplr(left_graph)
-        bottom_half = np.concatenate((left_graph, right_graph), axis=1)
-        top_half = np.flipud(bottom_half.copy())
-        frame = np.vstack((bottom_half, top_half))
+    def _get_bar_height(self) -> int:
+        return self._half_height
 
-        if self._height % 2:  # odd
-            frame = np.delete(frame, int(self._half_height), axis=0)
-        return frame
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        # odd heights share the center row
+        skipped = self._height % 2
+        return np.concatenate(
+            (
+                np.arange(self._half_height)[::-1],
+                np.arange(skipped, self._half_height),
+            )
+        )
 
 
 class Mouth(Style):
@@ -314,39 +593,15 @@ class Mouth(Style):
             gradient_str, self._half_height
         )
 
-    def _generate_frame(
-        self,
-        left_channel: NDArray[np.float64],
-        right_channel: NDArray[np.float64],
-    ) -> NDArray[np.uint8]:
-        left_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._half_height,
-            left_channel,
-            self._gradient_array,
-        )
-        right_graph = self._generate_bar_graph(
-            int(self._each_channel_width),
-            self._half_height,
-            right_channel,
-            self._gradient_array,
-        )
-
-        left_graph = np.fliplr(left_graph)
-        bottom_half = np.concatenate((left_graph, right_graph), axis=1)
-        top_half = np.flipud(bottom_half.copy())
-        frame = np.vstack((top_half, bottom_half))
-
-        if self._height % 2:  # odd
-            frame = np.delete(frame, int(self._half_height), axis=0)
-        return frame
-
+    def _get_bar_height(self) -> int:
+        return self._half_height
 
-STYLE: Dict[str, Type[Style]] = {
-    "bottom_up": BottomUp,
-    "top_down": TopDown,
-    "per_bin_color": PerBinColor,
-    "shifting_hue": ShiftingHue,
-    "center_out": CenterOut,
-    "mouth": Mouth,
-}
+    def _get_row_distances(self) -> NDArray[np.intp]:
+        # odd heights drop the longest row of the bottom bars
+        skipped = self._height % 2
+        return np.concatenate(
+            (
+                np.arange(self._half_height),
+                np.arange(self._half_height - skipped)[::-1],
+            )
+        )
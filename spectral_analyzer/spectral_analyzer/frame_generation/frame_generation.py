@@ -1,8 +1,201 @@
+import contextlib
 import multiprocessing as mp
-from typing import List
+import queue
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+)
 
-from .. import teensy_reciever
-from .display_styles import STYLE
+import numpy as np
+from numpy.typing import NDArray
+
+from .. import (
+    analysis,
+    capture,
+    mailbox,
+    smoothing,
+    teensy_reciever,
+    tracing,
+)
+from . import gradient, registry
+from .compositing import Compositor
+
+if TYPE_CHECKING:
+    from .display_styles import Style
+
+# frame queues must be made with this `maxsize`, so that they never hold a
+# frame that is about to be rendered into again. When one is full its oldest
+# frame is dropped, so a slow output never holds up rendering for the others
+FRAME_QUEUE_SIZE = 2
+
+
+class FrameRing:
+    """Frames to render into, reused in turn
+
+    A frame is only rendered into again after `size - 1` others, so whatever
+    it was handed to has that long to be done with it.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], size: int):
+        self._frames = np.zeros((size, *shape), dtype=np.uint8)
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def next_frame(self) -> NDArray[np.uint8]:
+        frame = self._frames[self._next]
+        self._next = (self._next + 1) % len(self._frames)
+        return frame
+
+
+def _report_on_signal(report: Callable[[], str]) -> None:
+    """Print the report whenever the process receives SIGUSR1"""
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print(report()))
+
+
+def _analysis_packets(
+    band_count: int | None,
+    file: str = "",
+    sample_rate: int = analysis.TEENSY_SAMPLE_RATE,
+    fft_size: int = analysis.TEENSY_FFT_SIZE,
+    hop_size: int = 0,
+) -> Iterator[teensy_reciever.Packet]:
+    if file:
+        return analysis.wav_packets(
+            Path(file),
+            fft_size=fft_size,
+            hop_size=hop_size or None,
+            band_count=band_count,
+        )
+    return analysis.pyaudio_packets(
+        sample_rate=sample_rate,
+        fft_size=fft_size,
+        hop_size=hop_size or None,
+        band_count=band_count,
+    )
+
+
+# reads the next pair of normalized bins, stamping the trace (if any) with
+# when they were read
+BinsReader = Callable[
+    [tracing.Trace | None], Tuple[NDArray[np.float32], NDArray[np.float32]]
+]
+# renders a frame from a pair of normalized bins
+FrameRenderer = Callable[
+    [NDArray[np.float32], NDArray[np.float32]], NDArray[np.uint8]
+]
+
+
+def _send_frame(
+    frame: NDArray[np.uint8],
+    trace: tracing.Trace | None,
+    frame_queues: List[mp.Queue],
+):
+    if trace is not None:
+        trace.stamp("generated")
+    for frame_queue in frame_queues:
+        try:
+            frame_queue.put_nowait((frame, trace))
+        except queue.Full:
+            try:
+                frame_queue.get_nowait()
+            except queue.Empty:
+                # taken by its output in the meantime, or not yet through an
+                # `mp.Queue`'s pipe
+                pass
+            try:
+                frame_queue.put_nowait((frame, trace))
+            except queue.Full:
+                # still full, this output misses this frame
+                pass
+
+
+def _render_as_read(
+    read_bins: BinsReader,
+    render_frame: FrameRenderer,
+    frame_queues: List[mp.Queue],
+    trace_latency: bool,
+) -> None:
+    """Render a frame for every pair of bins, as soon as it is read"""
+    while True:
+        trace = tracing.Trace() if trace_latency else None
+        try:
+            left_channel_bins, right_channel_bins = read_bins(trace)
+        except EOFError:
+            return
+
+        _send_frame(
+            render_frame(left_channel_bins, right_channel_bins),
+            trace,
+            frame_queues,
+        )
+
+
+def _read_into_mailbox(
+    read_bins: BinsReader,
+    bins_mailbox: mailbox.BinsMailbox,
+    trace_latency: bool,
+) -> None:
+    try:
+        while True:
+            trace = tracing.Trace() if trace_latency else None
+            bins_mailbox.put(*read_bins(trace), trace)
+    except EOFError:
+        pass
+    finally:
+        bins_mailbox.close()
+
+
+def _render_on_clock(
+    read_bins: BinsReader,
+    render_frame: FrameRenderer,
+    frame_queues: List[mp.Queue],
+    trace_latency: bool,
+    display_rate: float,
+) -> None:
+    """Render `display_rate` frames per second from the newest bins
+
+    Bins are read on a separate thread, so a slow style can't hold up
+    reading (and the other way around).
+    """
+    bins_mailbox = mailbox.BinsMailbox()
+    threading.Thread(
+        target=_read_into_mailbox,
+        args=(read_bins, bins_mailbox, trace_latency),
+        daemon=True,
+    ).start()
+
+    frame_period = 1 / display_rate
+    next_frame_time = time.monotonic()
+    bins = np.zeros((2, 0), dtype=np.float32)
+    while not bins_mailbox.closed:
+        next_frame_time += frame_period
+        delay = next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # we fell behind, don't try to catch up
+            next_frame_time -= delay
+
+        sequence, bins, trace = bins_mailbox.get(bins)
+        if not sequence:
+            continue
+        _send_frame(
+            render_frame(bins[0], bins[1]),
+            # the same bins may be rendered more than once
+            trace.copy() if trace is not None else None,
+            frame_queues,
+        )
 
 
 def process_function(
@@ -12,33 +205,138 @@ def process_function(
     height: int,
     style: str,
     gradient_str: str,
+    normalize_channels_separately: bool = False,
+    serial_ingest: str = "stream",
+    source: str = "serial",
+    replay_file: str = "",
+    replay_speed: float = 1,
+    analysis_config: Dict[str, Any] | None = None,
+    display_rate: float = 0,
+    trace_latency: bool = False,
+    smoothing_config: Dict[str, Any] | None = None,
+    layers: List[Dict[str, Any]] | None = None,
+    gradient_cache_dir: str = "",
+    gradient_direction: str = "vertical",
 ) -> None:
-    generate_frame = STYLE[style](
-        width=width, height=height, gradient_str=gradient_str
-    )
+    if gradient_cache_dir:
+        gradient.set_raster_directory(Path(gradient_cache_dir))
 
-    with open(teensy_port, "r") as teensy_port_stream:
-        left_channel_bins = None
-        right_channel_bins = None
-        while True:
-            channel, bins = teensy_reciever.get_bins(teensy_port_stream)
-            if channel == "l":
-                assert left_channel_bins is None
-                left_channel_bins = bins
-
-            if channel == "r":
-                assert right_channel_bins is None
-                right_channel_bins = bins
-
-            if (
-                left_channel_bins is not None
-                and right_channel_bins is not None
-            ):
-                frame = generate_frame(
-                    left_channel_bins,
-                    right_channel_bins,
+    generate_frame: Style | Compositor
+    if layers:
+        generate_frame = Compositor.from_config(
+            width, height, layers, gradient_str, gradient_direction
+        )
+    else:
+        generate_frame = registry.styles[style](
+            width=width,
+            height=height,
+            gradient_str=gradient_str,
+            gradient_direction=gradient_direction,
+        )
+    # a frame stays untouched while it is in any of the frame queues
+    frames = FrameRing(generate_frame.frame_shape, FRAME_QUEUE_SIZE + 1)
+
+    smoothing_config = dict(smoothing_config or {})
+    if smoothing_config.pop("enabled", False):
+        peak_markers = smoothing_config.pop("peak_markers", False)
+        smoother = smoothing.Smoother(**smoothing_config)
+
+        def render_frame(
+            left_channel: NDArray[np.float32],
+            right_channel: NDArray[np.float32],
+        ) -> NDArray[np.uint8]:
+            left_channel, right_channel = smoother(left_channel, right_channel)
+            peaks = smoother.peaks if peak_markers else (None, None)
+            return generate_frame(
+                left_channel, right_channel, frames.next_frame(), *peaks
+            )
+
+    else:
+
+        def render_frame(
+            left_channel: NDArray[np.float32],
+            right_channel: NDArray[np.float32],
+        ) -> NDArray[np.uint8]:
+            return generate_frame(
+                left_channel, right_channel, frames.next_frame()
+            )
+
+    normalizers: Dict[str, teensy_reciever.BinNormalizer]
+    if normalize_channels_separately:
+        normalizers = {
+            channel: teensy_reciever.BinNormalizer(channels=(channel,))
+            for channel in ("l", "r")
+        }
+    else:
+        shared_normalizer = teensy_reciever.BinNormalizer(channels=("l", "r"))
+        normalizers = {"l": shared_normalizer, "r": shared_normalizer}
+
+    with contextlib.ExitStack() as stack:
+        packets: Iterator[teensy_reciever.Packet]
+        if source == "replay":
+            packets = capture.replay(Path(replay_file), speed=replay_speed)
+        elif source == "analysis":
+            analysis_config = dict(analysis_config or {})
+            bands = analysis_config.pop("bands", "matrix")
+            if bands == "teensy":
+                band_count = None
+            elif bands == "matrix":
+                # one band per column, so the style never has to resample
+                band_count = generate_frame.each_channel_width
+            else:
+                band_count = int(bands)
+            packets = _analysis_packets(band_count, **analysis_config)
+        else:
+            teensy_port_stream = stack.enter_context(
+                teensy_reciever.open_port(teensy_port)
+            )
+            packets = teensy_reciever.iter_packets(teensy_port_stream)
+
+        read_bins: BinsReader
+        if source == "serial" and serial_ingest == "latest":
+            reader = teensy_reciever.BulkReader(teensy_port_stream)
+            _report_on_signal(
+                lambda: f"skipped frames: {reader.skipped_frames}"
+            )
+
+            def read_bins(
+                trace: tracing.Trace | None,
+            ) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+                _, raw_left, raw_right = reader.read_latest_pair()
+                if trace is not None:
+                    trace.stamp("read")
+                return (
+                    normalizers["l"]("l", raw_left),
+                    normalizers["r"]("r", raw_right),
                 )
-                for frame_queue in frame_queues:
-                    frame_queue.put(frame)
-                left_channel_bins = None
-                right_channel_bins = None
+
+        else:
+            pairer = teensy_reciever.ChannelPairer()
+            _report_on_signal(
+                lambda: (
+                    f"missed frames: {pairer.missed_frames}, "
+                    f"duplicate packets: {pairer.duplicate_packets}"
+                )
+            )
+
+            def read_bins(
+                trace: tracing.Trace | None,
+            ) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+                return teensy_reciever.get_bins(
+                    packets, pairer, normalizers, trace
+                )
+
+        if display_rate:
+            _render_on_clock(
+                read_bins,
+                render_frame,
+                frame_queues,
+                trace_latency,
+                display_rate,
+            )
+        else:
+            _render_as_read(
+                read_bins, render_frame, frame_queues, trace_latency
+            )
+
+    print("No more bins, exiting...")
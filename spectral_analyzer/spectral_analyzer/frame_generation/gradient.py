@@ -1,64 +1,33 @@
-import colorsys
+import functools
+import hashlib
+import os
+import tempfile
 import xml.etree.ElementTree as ET
-from typing import List, NamedTuple, Tuple
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Sequence, Tuple
 
 import numpy as np
-from numpy.typing import NDArray
+from numpy.typing import ArrayLike, NDArray
 from PIL import ImageColor
 
 from .. import PROJECT_ROOT
+from . import color_transform, registry
 
 GRADIENTS = PROJECT_ROOT / "frame_generation" / "gradients"
 
+# the most memory rasterized gradients are kept in, the least recently used
+# are dropped first
+RASTER_CACHE_BYTES = 1024 * 1024
 
-def _rgb_to_hsv(rgb):
-    # https://stackoverflow.com/a/7274986/1342874
-    # Translated from source of colorsys.rgb_to_hsv
-    # r,g,b should be a numpy arrays with values between 0 and 255
-    # rgb_to_hsv returns an array of floats between 0.0 and 1.0.
-    rgb = rgb.astype("float")
-    hsv = np.zeros_like(rgb)
-    # in case an RGBA array was passed, just copy the A channel
-    hsv[..., 3:] = rgb[..., 3:]
-    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
-    maxc = np.max(rgb[..., :3], axis=-1)
-    minc = np.min(rgb[..., :3], axis=-1)
-    hsv[..., 2] = maxc
-    mask = maxc != minc
-    hsv[mask, 1] = (maxc - minc)[mask] / maxc[mask]
-    rc = np.zeros_like(r)
-    gc = np.zeros_like(g)
-    bc = np.zeros_like(b)
-    rc[mask] = (maxc - r)[mask] / (maxc - minc)[mask]
-    gc[mask] = (maxc - g)[mask] / (maxc - minc)[mask]
-    bc[mask] = (maxc - b)[mask] / (maxc - minc)[mask]
-    hsv[..., 0] = np.select(
-        [r == maxc, g == maxc], [bc - gc, 2.0 + rc - bc], default=4.0 + gc - rc
-    )
-    hsv[..., 0] = (hsv[..., 0] / 6.0) % 1.0
-    return hsv
-
-
-def _hsv_to_rgb(hsv):
-    # https://stackoverflow.com/a/7274986/1342874
-    # Translated from source of colorsys.hsv_to_rgb
-    # h,s should be a numpy arrays with values between 0.0 and 1.0
-    # v should be a numpy array with values between 0.0 and 255.0
-    # hsv_to_rgb returns an array of uints between 0 and 255.
-    rgb = np.empty_like(hsv)
-    rgb[..., 3:] = hsv[..., 3:]
-    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
-    i = (h * 6.0).astype("uint8")
-    f = (h * 6.0) - i
-    p = v * (1.0 - s)
-    q = v * (1.0 - s * f)
-    t = v * (1.0 - s * (1.0 - f))
-    i = i % 6
-    conditions = [s == 0.0, i == 1, i == 2, i == 3, i == 4, i == 5]
-    rgb[..., 0] = np.select(conditions, [v, q, p, p, t, v], default=v)
-    rgb[..., 1] = np.select(conditions, [v, v, v, q, p, p], default=t)
-    rgb[..., 2] = np.select(conditions, [v, p, t, v, v, q], default=p)
-    return rgb.astype("uint8")
+# (source, version, height, color transform, width, direction) to raster,
+# see `rasterize`
+RasterKey = Tuple[
+    str, int, int, color_transform.ColorTransform, int | None, str
+]
+_rasters: "OrderedDict[RasterKey, NDArray[np.uint8]]" = OrderedDict()
+_rasters_bytes = 0
+_raster_directory: Path | None = None
 
 
 class RGBA(NamedTuple):
@@ -68,13 +37,12 @@ class RGBA(NamedTuple):
     alpha: int = 255
 
 
-def shift_hue(rgba: RGBA, hue_shift):
-    rgb_array = np.array(rgba[:-1], dtype=np.uint8)
-    hsv = _rgb_to_hsv(rgb_array)
-    hsv[..., 0] = hsv[..., 0] + hue_shift
-    rgb_array = _hsv_to_rgb(hsv)
-
-    return RGBA(rgb_array[0], rgb_array[1], rgb_array[2], rgba[-1])
+def shift_hue(rgba: RGBA, hue_shift: float) -> RGBA:
+    shifted = color_transform.transform_colors(
+        np.array([rgba], dtype=np.uint8),
+        color_transform.ColorTransform(hue_shift=hue_shift),
+    )
+    return RGBA(*shifted[0].tolist())
 
 
 def _hex_to_rgba(hex_color: str) -> RGBA:
@@ -86,13 +54,35 @@ def _hex_to_rgba(hex_color: str) -> RGBA:
     return rgba_color
 
 
+# the ways `gen_gradient_2d` can run a gradient across a table
+LINEAR_DIRECTIONS = ("vertical", "horizontal", "diagonal")
+# the ways `rasterize` can, see `_build_raster`
+DIRECTIONS = (*LINEAR_DIRECTIONS, "per_column")
+
+
+def _split_stops(
+    stops: Sequence[Tuple[float, RGBA]],
+) -> Tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """The offsets and colors of the stops, sorted by offset"""
+    stops = sorted(stops)
+    offsets = np.array([offset for offset, _ in stops], dtype=np.float64)
+    assert ((0 <= offsets) & (offsets <= 1)).all()
+    # as floats, so colors given as uint8s don't wrap around
+    colors = np.array([color for _, color in stops], dtype=np.float64)
+    return offsets, colors
+
+
 def gen_gradient(
-    height: int, stops: List[Tuple[float, RGBA]]
+    height: int, stops: Sequence[Tuple[float, RGBA]]
 ) -> NDArray[np.uint8]:
     """Create a gradient of multiple stops.
 
     Terminology (and hopefully output) is stolen from the SVG standard.
 
+    Each stop ends a segment at its offset, which blends from the color of
+    the stop before it on its first row to its own color on its last row.
+    Rows after the last stop are its color.
+
     Args:
         height: the height of the gradient
         stops: a list of stops. A stop is a tuple. The first value of the stop is
@@ -100,45 +90,108 @@ def gen_gradient(
             and a RGB tuple where each integer is between 0 and 255.
 
     Returns:
-        ndarray: the gradient with a shape of (1, height, 4)
+        ndarray: the gradient with a shape of (height, 4)
     """
-    stops.sort()
-
-    gradient_array = np.zeros((height, 4))
-    remaining_points = height
-    previous_end_point = 0
-    previous_color: RGBA | None = None
-    for stop in stops:
-        offset = stop[0]
-        assert 0 <= offset <= 1
-        color = stop[1]
-
-        end_point = int(remaining_points * offset)
-        size = end_point - previous_end_point
-        coefficient = np.linspace(1, 0, size)[:, None]
-
-        if previous_color is None:
-            # first stop
-            previous_color = color
-
-        bottom_color_array = np.full((size, 4), previous_color)
-        top_color_array = np.full((size, 4), color)
-        gradient_array[previous_end_point:end_point] = (
-            top_color_array
-            + (bottom_color_array - top_color_array) * coefficient
+    offsets, colors = _split_stops(stops)
+    segment_ends = (height * offsets).astype(np.intp)
+    segment_starts = np.concatenate(([0], segment_ends[:-1]))
+    segment_sizes = segment_ends - segment_starts
+    # the first segment is all the first color
+    previous_colors = np.concatenate((colors[:1], colors[:-1]))
+
+    # each segment's first and last row, and the colors on them. a segment
+    # of one row only has its first, and empty ones have neither
+    has_row = np.stack((segment_sizes > 0, segment_sizes > 1), axis=1)
+    rows = np.stack((segment_starts, segment_ends - 1), axis=1)[has_row]
+    row_colors = np.stack((previous_colors, colors), axis=1)[has_row]
+    # then the last color from the end of the last segment on
+    rows = np.append(rows, segment_ends[-1])
+    row_colors = np.concatenate((row_colors, colors[-1:]))
+
+    gradient_array = np.empty((height, 4))
+    for channel in range(4):
+        gradient_array[:, channel] = np.interp(
+            np.arange(height), rows, row_colors[:, channel]
         )
+    return gradient_array.astype(np.uint8)
+
 
-        previous_end_point = end_point
-        previous_color = color
+def interpolate_stops(
+    positions: ArrayLike, stops: Sequence[Tuple[float, RGBA]]
+) -> NDArray[np.uint8]:
+    """The color of a gradient at each position
 
-    if offset != 1:
-        size = height - end_point
-        color_array = np.full((size, 4), previous_color)
-        gradient_array[end_point:height] = color_array
+    Args:
+        positions: where to take colors, between 0 and 1 (like offsets)
+        stops: the gradient's stops, see `gen_gradient`
 
+    Returns:
+        NDArray[np.uint8]: the colors, with the shape (*positions.shape, 4)
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    offsets, colors = _split_stops(stops)
+    gradient_array = np.empty((*positions.shape, 4))
+    for channel in range(4):
+        gradient_array[..., channel] = np.interp(
+            positions, offsets, colors[:, channel]
+        )
     return gradient_array.astype(np.uint8)
 
 
+def gen_gradient_2d(
+    height: int,
+    width: int,
+    stops: Sequence[Tuple[float, RGBA]],
+    direction: str = "vertical",
+) -> NDArray[np.uint8]:
+    """Create a gradient that runs across a table
+
+    Args:
+        height: the height of the table
+        width: the width of the table
+        stops: the gradient's stops, see `gen_gradient`
+        direction: one of `LINEAR_DIRECTIONS`. "vertical" runs from the
+            first row to the last, "horizontal" from the first column to the
+            last and "diagonal" from the first row and column to the last.
+
+    Returns:
+        NDArray[np.uint8]: the gradient with a shape of (height, width, 4)
+    """
+    if direction not in LINEAR_DIRECTIONS:
+        raise ValueError(
+            f"direction must be one of {LINEAR_DIRECTIONS}, "
+            f"not {direction!r}"
+        )
+    rows = np.linspace(0, 1, height)[:, None]
+    columns = np.linspace(0, 1, width)[None, :]
+    if direction == "vertical":
+        positions = rows + 0 * columns
+    elif direction == "horizontal":
+        positions = 0 * rows + columns
+    else:
+        positions = (rows + columns) / 2
+    return interpolate_stops(positions, stops)
+
+
+def gen_column_gradients(
+    height: int, stops_by_column: Sequence[Sequence[Tuple[float, RGBA]]]
+) -> NDArray[np.uint8]:
+    """Create a table where each column is a gradient of its own
+
+    Args:
+        height: the height of the table
+        stops_by_column: the stops of each column's gradient, see
+            `gen_gradient`
+
+    Returns:
+        NDArray[np.uint8]: the gradients with a shape of
+            (height, len(stops_by_column), 4)
+    """
+    return np.stack(
+        [gen_gradient(height, stops) for stops in stops_by_column], axis=1
+    )
+
+
 def svg_to_gradient(svg_name) -> List[Tuple[float, RGBA]]:
     tree = ET.parse((GRADIENTS / svg_name).with_suffix(".svg"))
     # https://stackoverflow.com/a/55049369/1342874
@@ -158,6 +211,188 @@ def svg_to_gradient(svg_name) -> List[Tuple[float, RGBA]]:
     return stops
 
 
+def _gradient_source(gradient_str: str) -> Tuple[str, int]:
+    """What a gradient is made from and its version, to cache it by
+
+    Returns:
+        the SVG's path and modification time, or the entry point's name and
+            0 for gradients in `registry.gradients`
+    """
+    if gradient_str in registry.gradients:
+        return f"{registry.GRADIENT_GROUP}:{gradient_str}", 0
+    path = (GRADIENTS / gradient_str).with_suffix(".svg")
+    return str(path), path.stat().st_mtime_ns
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_stops(
+    gradient_str: str, source: Tuple[str, int]
+) -> Tuple[Tuple[float, RGBA], ...]:
+    # `source` is only there to key the cache by
+    if gradient_str in registry.gradients:
+        return tuple(registry.gradients[gradient_str]())
+    return tuple(svg_to_gradient(gradient_str))
+
+
+def load_stops(gradient_str: str) -> List[Tuple[float, RGBA]]:
+    """The stops of a gradient from `registry.gradients`, or else the SVG of
+    that name in `GRADIENTS`
+
+    Each is only parsed once (again if its SVG changes).
+    """
+    return list(_parse_stops(gradient_str, _gradient_source(gradient_str)))
+
+
+def set_raster_directory(directory: Path | None) -> None:
+    """Also keep rasterized gradients as `.npy` files in `directory`
+
+    Processes that use the same directory share them, and they last between
+    runs. Gradients from `registry.gradients` are only kept in memory.
+    """
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+    global _raster_directory
+    _raster_directory = directory
+
+
+def _raster_path(key: RasterKey) -> Path | None:
+    if _raster_directory is None or key[1] == 0:
+        return None
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+    return _raster_directory / f"{Path(key[0]).stem}-{key[2]}-{digest}.npy"
+
+
+def _read_raster(
+    path: Path, shape: Tuple[int, ...]
+) -> NDArray[np.uint8] | None:
+    try:
+        raster = np.load(path)
+    except (OSError, ValueError):
+        # missing, or being replaced by another process
+        return None
+    if raster.shape != shape or raster.dtype != np.uint8:
+        return None
+    return raster
+
+
+def _write_raster(path: Path, raster: NDArray[np.uint8]) -> None:
+    # written aside and moved into place, so it is never read half written
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, suffix=".npy", delete=False
+    ) as f:
+        np.save(f, raster)
+    os.replace(f.name, path)
+
+
+def _transform_stops(
+    stops: List[Tuple[float, RGBA]], transform: color_transform.ColorTransform
+) -> List[Tuple[float, RGBA]]:
+    if transform.is_identity:
+        return stops
+    # the stops are transformed and blended between as they are, like the
+    # gradient was drawn with the transformed colors
+    colors = color_transform.transform_colors(
+        np.array([color for _, color in stops], dtype=np.uint8), transform
+    )
+    return [
+        # as ints, `gen_gradient` would wrap around blending uint8s
+        (offset, RGBA(*color.tolist()))
+        for (offset, _), color in zip(stops, colors)
+    ]
+
+
+def _build_raster(
+    gradient_str: str,
+    height: int,
+    transform: color_transform.ColorTransform,
+    width: int | None,
+    direction: str,
+) -> NDArray[np.uint8]:
+    stops = load_stops(gradient_str)
+    if width is None:
+        return gen_gradient(height, _transform_stops(stops, transform))
+    if direction == "per_column":
+        # the hue goes all the way around across the columns
+        return gen_column_gradients(
+            height,
+            [
+                _transform_stops(
+                    stops,
+                    transform._replace(
+                        hue_shift=transform.hue_shift + column / width
+                    ),
+                )
+                for column in range(width)
+            ],
+        )
+    return gen_gradient_2d(
+        height, width, _transform_stops(stops, transform), direction
+    )
+
+
+def rasterize(
+    gradient_str: str,
+    height: int,
+    transform: color_transform.ColorTransform = color_transform.IDENTITY,
+    width: int | None = None,
+    direction: str = "vertical",
+) -> NDArray[np.uint8]:
+    """A gradient, `height` pixels tall with the colors of its stops
+    transformed
+
+    Rasters are cached by what the gradient is made from (and when that
+    changed) and the arguments, in memory and in the raster directory (see
+    `set_raster_directory`), so each is only parsed, built and transformed
+    once. Animating a transform through a fixed set of steps only builds
+    each step once.
+
+    Args:
+        gradient_str: the name of the gradient, see `load_stops`
+        height: the height of the gradient
+        transform: how to change the gradient's colors
+        width: the width of a 2D gradient
+        direction: the direction of a 2D gradient, one of `DIRECTIONS`.
+            "per_column" gives each column the gradient with its hue
+            shifted by how far across the table the column is, the others
+            are drawn by `gen_gradient_2d`
+
+    Returns:
+        NDArray[np.uint8]: the gradient with a shape of (height, 4), or
+            (height, width, 4) with a width. It is shared through the cache,
+            so it is read only.
+    """
+    global _rasters_bytes
+    key = (
+        *_gradient_source(gradient_str),
+        height,
+        transform,
+        width,
+        direction,
+    )
+    raster = _rasters.get(key)
+    if raster is not None:
+        _rasters.move_to_end(key)
+        return raster
+
+    path = _raster_path(key)
+    if path is not None:
+        shape = (height, 4) if width is None else (height, width, 4)
+        raster = _read_raster(path, shape)
+    if raster is None:
+        raster = _build_raster(
+            gradient_str, height, transform, width, direction
+        )
+        if path is not None:
+            _write_raster(path, raster)
+
+    raster.setflags(write=False)
+    _rasters[key] = raster
+    _rasters_bytes += raster.nbytes
+    while _rasters_bytes > RASTER_CACHE_BYTES and len(_rasters) > 1:
+        _, dropped = _rasters.popitem(last=False)
+        _rasters_bytes -= dropped.nbytes
+    return raster
+
+
 def from_config(gradient_str: str, height: int) -> NDArray[np.uint8]:
-    stops = svg_to_gradient(gradient_str)
-    return gen_gradient(height, stops)
+    return rasterize(gradient_str, height)
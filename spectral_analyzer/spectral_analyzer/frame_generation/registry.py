@@ -0,0 +1,90 @@
+"""Find styles and gradients by name, importing each only once it is used.
+
+Other packages can add their own styles and gradients through entry points,
+without changing this package:
+
+    [project.entry-points."spectral_analyzer.styles"]
+    my_style = "my_package.styles:MyStyle"
+
+    [project.entry-points."spectral_analyzer.gradients"]
+    my_gradient = "my_package.gradients:my_gradient_stops"
+
+A style is a `display_styles.Style` subclass. A gradient is a function that
+takes no arguments and returns its stops, like `gradient.svg_to_gradient`
+does. Built-in names can't be replaced.
+"""
+
+import functools
+from importlib import metadata
+from typing import Any, Dict, Iterator, Mapping
+
+STYLE_GROUP = "spectral_analyzer.styles"
+GRADIENT_GROUP = "spectral_analyzer.gradients"
+
+_BUILTIN_STYLES = {
+    name: f"spectral_analyzer.frame_generation.display_styles:{class_name}"
+    for name, class_name in (
+        ("bottom_up", "BottomUp"),
+        ("top_down", "TopDown"),
+        ("per_bin_color", "PerBinColor"),
+        ("shifting_hue", "ShiftingHue"),
+        ("center_out", "CenterOut"),
+        ("mouth", "Mouth"),
+    )
+}
+
+
+class Registry(Mapping[str, Any]):
+    """Everything in an entry point group, loaded the first time it is used
+
+    Args:
+        group: the entry point group
+        builtins: "module:attribute" of everything this package provides
+            itself, so that it is found without being installed
+    """
+
+    def __init__(self, group: str, builtins: Dict[str, str] | None = None):
+        self._group = group
+        self._builtins = builtins or {}
+        self._loaded: Dict[str, Any] = {}
+
+    @functools.cached_property
+    def _entry_points(self) -> Dict[str, metadata.EntryPoint]:
+        # looking through the installed packages is slow too, so it waits
+        # until something is looked up
+        entry_points = {
+            entry_point.name: entry_point
+            for entry_point in metadata.entry_points(group=self._group)
+        }
+        for name, value in self._builtins.items():
+            entry_points[name] = metadata.EntryPoint(
+                name=name, value=value, group=self._group
+            )
+        return entry_points
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._loaded:
+            try:
+                entry_point = self._entry_points[name]
+            except KeyError:
+                raise KeyError(
+                    f"no {self._group} named {name!r}, "
+                    f"choose from: {', '.join(sorted(self))}"
+                ) from None
+            self._loaded[name] = entry_point.load()
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entry_points)
+
+    def __len__(self) -> int:
+        return len(self._entry_points)
+
+    def __contains__(self, name: object) -> bool:
+        # without loading it
+        return name in self._entry_points
+
+
+styles = Registry(STYLE_GROUP, _BUILTIN_STYLES)
+# the gradients in `gradient.GRADIENTS` are found by `gradient.load_stops`
+gradients = Registry(GRADIENT_GROUP)
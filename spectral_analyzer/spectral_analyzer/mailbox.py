@@ -0,0 +1,85 @@
+"""Hand the newest bins from one thread to another without locking."""
+
+from typing import List, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import tracing
+
+
+class BinsMailbox:
+    """Holds only the newest pair of bins
+
+    The writer fills the slot after the published one and then publishes it,
+    so it never touches the slot a reader is most likely copying. Each slot
+    is stamped with the sequence number it holds; a reader that finds the
+    stamp changed while it was copying (the writer lapped the whole ring)
+    simply copies again.
+    """
+
+    def __init__(self, slot_count: int = 4):
+        self._slot_count = slot_count
+        self._bin_count = 0
+        # the sequence number of the newest pair, 0 until there is one
+        self._published = 0
+        self.closed = False
+
+    def _allocate(self, bin_count: int) -> None:
+        self._bin_count = bin_count
+        self._slots = np.zeros(
+            (self._slot_count, 2, bin_count), dtype=np.float32
+        )
+        self._stamps = [0] * self._slot_count
+        self._traces: List[tracing.Trace | None] = [None] * self._slot_count
+
+    def put(
+        self,
+        left: NDArray[np.float32],
+        right: NDArray[np.float32],
+        trace: tracing.Trace | None = None,
+    ) -> None:
+        """Replace the newest pair (copies the bins)"""
+        if len(left) != self._bin_count:
+            self._allocate(len(left))
+
+        sequence = self._published + 1
+        slot = sequence % self._slot_count
+        # invalidate the slot while it is being written
+        self._stamps[slot] = 0
+        self._slots[slot, 0] = left
+        self._slots[slot, 1] = right
+        self._traces[slot] = trace
+        self._stamps[slot] = sequence
+        self._published = sequence
+
+    def close(self) -> None:
+        """Tell readers nothing more is coming"""
+        self.closed = True
+
+    def get(
+        self, out: NDArray[np.float32]
+    ) -> Tuple[int, NDArray[np.float32], tracing.Trace | None]:
+        """Copy the newest pair
+
+        Args:
+            out: (2, bins) array to copy the left and right bins into,
+                resized if the bin count changed
+
+        Returns:
+            the sequence number of the pair (0 if nothing has been put yet),
+                the array the pair was copied into and the pair's trace
+        """
+        while True:
+            sequence = self._published
+            if not sequence:
+                return 0, out, None
+
+            slot = sequence % self._slot_count
+            slots = self._slots
+            if out.shape != slots.shape[1:]:
+                out = np.empty(slots.shape[1:], dtype=np.float32)
+            np.copyto(out, slots[slot])
+            trace = self._traces[slot]
+            if self._stamps[slot] == sequence:
+                return sequence, out, trace
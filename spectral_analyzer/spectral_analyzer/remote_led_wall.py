@@ -1,10 +1,45 @@
 import multiprocessing as mp
 import pickle
+import signal
 import socket
 import struct
 import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict
 
 import numpy as np
+from numpy.typing import NDArray
+
+from . import calibration, dithering, tracing
+
+# the server replies to traced frames with the frame's trace id and how many
+# seconds it took to show the frame after receiving it
+TRACE_REPLY = struct.Struct("!Qd")
+# traces the server never replied to are recorded without its stages
+MAX_PENDING_TRACES = 256
+
+
+def led_order(width: int, height: int) -> NDArray[np.intp]:
+    """Where each byte the LED wall shows comes from in a flattened RGBA frame
+
+    The LED wall's pixels are wired in rows from the bottom up, with every
+    other row running backwards (see `LEDWall`), and the frame is mirrored
+    left to right so each channel shows on its own side. The alpha channel
+    is left out.
+
+    Returns:
+        (height * width * 3,) indexes into the frame's bytes, in the order
+            the LED wall shows them
+    """
+    pixels = np.arange(height * width).reshape(height, width)
+    # mirrored left to right
+    pixels = pixels[:, ::-1].copy()
+    # serpentine, then bottom up
+    pixels[1::2] = pixels[1::2, ::-1]
+    pixels = pixels[::-1]
+    return (pixels.reshape(-1, 1) * 4 + np.arange(3)).reshape(-1)
 
 
 class RemoteLEDWall:
@@ -16,13 +51,51 @@ class RemoteLEDWall:
         matrix_height: int,
         led_wall_server: str,
         brightness: int,
+        trace_latency: bool = False,
+        calibration_file: str = "",
+        dither: bool = False,
     ):
         self._width = matrix_width
         self._height = matrix_height
-        self._brightness = brightness / 100
+        if calibration_file:
+            led_calibration = calibration.Calibration.load(
+                Path(calibration_file), brightness / 100
+            )
+        else:
+            led_calibration = calibration.Calibration(
+                brightness=brightness / 100
+            )
+        # what each byte of each channel is shown as, one channel after
+        # another
+        self._calibration_tables = led_calibration.tables()
+        self._led_order = led_order(matrix_width, matrix_height)
+        self._led_frame = np.empty(len(self._led_order), dtype=np.uint8)
+        self._led_frame_indexes = np.empty(len(self._led_order), dtype=np.intp)
+        # where the table of each byte's channel starts
+        self._channel_offsets = np.tile(
+            np.arange(calibration.CHANNELS, dtype=np.intp) * 256,
+            matrix_width * matrix_height,
+        )
+        self._dither: dithering.TemporalDither | None = None
+        if dither:
+            self._dither = dithering.TemporalDither(
+                led_calibration.levels(), len(self._led_order)
+            )
 
         self._connect_to_remote_wall(led_wall_server=led_wall_server)
 
+        self.latency = tracing.LatencyHistograms()
+        self._next_trace_id = 0
+        # traces waiting for the server to reply, by id
+        self._pending_traces: Dict[int, tracing.Trace] = {}
+        # the replies are received on a thread of their own, this guards the
+        # pending traces and `latency` from both threads
+        self._traces_lock = threading.Lock()
+        if trace_latency:
+            threading.Thread(
+                target=self._receive_trace_replies, daemon=True
+            ).start()
+
     def _connect_to_remote_wall(self, led_wall_server: str):
         # connect to LED Wall
         # TODO: this should retry
@@ -37,12 +110,101 @@ class RemoteLEDWall:
         )
         self.led_wall_connection.connect((server_address, server_port))
 
-    def send_frame(self, frame) -> None:
-        # apply brightness
-        frame = np.multiply(frame, self._brightness).astype(np.uint8)
-        # TODO: figure out why the channels are backwards
-        frame = np.fliplr(frame)
-        pickled_frame = pickle.dumps(frame)
+    def _receive_trace_replies(self) -> None:
+        """Complete traces as the server replies to them
+
+        The server's clock can't be compared to ours, so the time the frame
+        took to reach the server is estimated as half the round trip, less
+        the time the server spent showing it.
+        """
+        replies = b""
+        while True:
+            data = self.led_wall_connection.recv(4096)
+            if not data:
+                return
+            reply_time = time.monotonic()
+            replies += data
+
+            complete = len(replies) - len(replies) % TRACE_REPLY.size
+            for trace_id, show_time in TRACE_REPLY.iter_unpack(
+                replies[:complete]
+            ):
+                with self._traces_lock:
+                    trace = self._pending_traces.pop(trace_id, None)
+                    if trace is None:
+                        continue
+                    sent_time = trace.timestamps[tracing.STAGES.index("sent")]
+                    travel_time = max(
+                        0, (reply_time - sent_time - show_time) / 2
+                    )
+                    trace.stamp("received", sent_time + travel_time)
+                    trace.stamp("acked", sent_time + travel_time + show_time)
+                    self.latency.record(trace)
+            replies = replies[complete:]
+
+    def _to_led_frame(self, frame: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        """Put a frame in the LED wall's order and calibrate its colors
+
+        One gather does the reordering, mirroring and alpha stripping, and a
+        second one looks each byte up in its channel's calibration table
+        (and dithers it), all into preallocated buffers.
+        """
+        led_frame = self._led_frame
+        np.take(
+            np.ascontiguousarray(frame).reshape(-1),
+            self._led_order,
+            out=led_frame,
+            mode="clip",
+        )
+        # `take` only indexes with intp without making a copy first
+        np.copyto(self._led_frame_indexes, led_frame)
+        np.add(
+            self._led_frame_indexes,
+            self._channel_offsets,
+            out=self._led_frame_indexes,
+        )
+        if self._dither is not None:
+            return self._dither(self._led_frame_indexes, led_frame)
+        np.take(
+            self._calibration_tables,
+            self._led_frame_indexes,
+            out=led_frame,
+            mode="clip",
+        )
+        return led_frame
+
+    def send_frame(
+        self, frame: NDArray[np.uint8], trace: tracing.Trace | None = None
+    ) -> None:
+        """Send an RGBA frame to be shown
+
+        The LED wall server is sent the frame's bytes flattened in the order
+        the LED wall shows them, so it can write them out as they are.
+        """
+        if frame.shape != (self._height, self._width, 4):
+            raise ValueError(
+                f"frame must be {(self._height, self._width, 4)}, "
+                f"not {frame.shape}"
+            )
+        led_frame = self._to_led_frame(frame)
+        if trace is None:
+            pickled_frame = pickle.dumps(led_frame)
+        else:
+            # the server replies to frames sent with an id
+            trace_id = self._next_trace_id
+            self._next_trace_id += 1
+            pickled_frame = pickle.dumps((led_frame, trace_id))
+
+        if trace is not None:
+            # registered before sending, as the server can reply before
+            # `sendall` returns
+            trace.stamp("sent")
+            with self._traces_lock:
+                self._pending_traces[trace_id] = trace
+                if len(self._pending_traces) > MAX_PENDING_TRACES:
+                    # ids only go up, so the smallest is the oldest
+                    oldest_id = min(self._pending_traces)
+                    self.latency.record(self._pending_traces.pop(oldest_id))
 
         # https://stackoverflow.com/a/60067126/1342874
         header = struct.pack("!Q", len(pickled_frame))
@@ -56,9 +218,14 @@ def process(frame_queue: mp.Queue, **kwargs):
     while not frame_queue.empty():
         frame_queue.get()
 
+    signal.signal(
+        signal.SIGUSR1,
+        lambda signum, frame: print(remote_led_wall.latency.report()),
+    )
+
     while True:
         # block until another frame is ready
-        frame = frame_queue.get(block=True, timeout=None)
-        # remove alpha channel
-        frame = frame[:, :, 0:3]
-        remote_led_wall.send_frame(frame)
+        frame, trace = frame_queue.get(block=True, timeout=None)
+        if trace is not None:
+            trace.stamp("dequeued")
+        remote_led_wall.send_frame(frame, trace)
@@ -0,0 +1,132 @@
+"""Smooth normalized bins over time and track their peaks."""
+
+import math
+import time
+from typing import Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+def _approach_coefficient(elapsed: float, time_constant: float) -> float:
+    """How much of the way to its target a value moves in `elapsed` seconds"""
+    if time_constant <= 0:
+        return 1
+    return 1 - math.exp(-elapsed / time_constant)
+
+
+class Smoother:
+    """Smooths the bins of both channels, and holds each bin's peak
+
+    Bins rise towards new energies with the `attack` time constant and fall
+    with the `release` one. A peak is held for `peak_hold` seconds after the
+    smoothed bin reaches it, then falls `peak_fall` (of the full bar height)
+    per second until the bin catches up with it again.
+
+    Everything is timed in seconds rather than frames, so it looks the same
+    at any frame rate. All state is preallocated, so smoothing does not
+    allocate.
+    """
+
+    def __init__(
+        self,
+        attack: float = 0,
+        release: float = 0,
+        peak_hold: float = 0,
+        peak_fall: float = 1,
+    ):
+        self._attack = attack
+        self._release = release
+        self._peak_hold = peak_hold
+        self._peak_fall = peak_fall
+        self._bin_count = 0
+        self._last_time: float | None = None
+
+    def _allocate(self, bin_count: int) -> None:
+        self._bin_count = bin_count
+        self._last_time = None
+        shape = (2, bin_count)
+        # left and right channel in each
+        self._targets = np.zeros(shape, dtype=np.float32)
+        self._levels = np.zeros(shape, dtype=np.float32)
+        self._peaks = np.zeros(shape, dtype=np.float32)
+        # seconds since each peak was reached
+        self._peak_ages = np.zeros(shape, dtype=np.float32)
+        self._peak_falls = np.empty(shape, dtype=np.float32)
+        self._coefficients = np.empty(shape, dtype=np.float32)
+        self._steps = np.empty(shape, dtype=np.float32)
+        self._mask = np.empty(shape, dtype=np.bool_)
+
+    @property
+    def peaks(self) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+        """The left and right channel's peaks, as of the last call"""
+        return self._peaks[0], self._peaks[1]
+
+    def __call__(
+        self,
+        left_channel: NDArray[np.float32],
+        right_channel: NDArray[np.float32],
+        now: float | None = None,
+    ) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+        """Move the smoothed bins towards the newest bins
+
+        Args:
+            left_channel: the left channel's normalized bins
+            right_channel: the right channel's normalized bins
+            now: the `time.monotonic()` of the frame (default: now)
+
+        Returns:
+            the smoothed left and right bins. These are buffers owned by the
+                smoother and are overwritten by the next call.
+        """
+        if now is None:
+            now = time.monotonic()
+        if len(left_channel) != self._bin_count:
+            self._allocate(len(left_channel))
+
+        targets = self._targets
+        levels = self._levels
+        peaks = self._peaks
+        peak_ages = self._peak_ages
+        mask = self._mask
+        targets[0] = left_channel
+        targets[1] = right_channel
+
+        if self._last_time is None:
+            # nothing to smooth from yet
+            np.copyto(levels, targets)
+            np.copyto(peaks, targets)
+            peak_ages.fill(0)
+        else:
+            elapsed = now - self._last_time
+
+            # attack where the bins are rising, release where they are falling
+            np.greater(targets, levels, out=mask)
+            self._coefficients.fill(
+                _approach_coefficient(elapsed, self._release)
+            )
+            np.copyto(
+                self._coefficients,
+                _approach_coefficient(elapsed, self._attack),
+                where=mask,
+            )
+            np.subtract(targets, levels, out=self._steps)
+            np.multiply(self._steps, self._coefficients, out=self._steps)
+            np.add(levels, self._steps, out=levels)
+
+            # drop the peaks for however much of `elapsed` they weren't held
+            peak_falls = self._peak_falls
+            np.add(peak_ages, elapsed, out=peak_ages)
+            np.subtract(peak_ages, self._peak_hold, out=peak_falls)
+            np.maximum(peak_falls, 0, out=peak_falls)
+            np.minimum(peak_falls, elapsed, out=peak_falls)
+            np.multiply(peak_falls, self._peak_fall, out=peak_falls)
+            np.subtract(peaks, peak_falls, out=peaks)
+
+            # and raise the ones the bins have reached
+            np.greater_equal(levels, peaks, out=mask)
+            np.copyto(peaks, levels, where=mask)
+            np.copyto(peak_ages, 0, where=mask)
+
+        self._last_time = now
+        return levels[0], levels[1]
@@ -1,77 +1,482 @@
-from io import TextIOWrapper
+import os
+import select
+import struct
+import tty
+from typing import BinaryIO, Iterator, Mapping, Sequence, Tuple
 
 import numpy as np
-import numpy.typing
+from numpy.typing import NDArray
 
-# the actual maximum energy of each bin
-max_bin_energies = None
-# what we are treating as the maximum energy of each bin for this frame
-acting_max_bin_energies = None
+from . import tracing
 
+# marks the start of a binary packet, see `audio_processing_teensy.ino`
+PACKET_SYNC = b"\xa5\x5a"
+# sync word, channel, sequence id, bin count; followed by float32 bins
+PACKET_HEADER = struct.Struct("<2scIB")
+# the bin count is a single byte
+MAX_BINS = 255
 
-def _get_bins_as_percentage_of_max(bins):
-    # we intentionally don't distinguish between channels for the max
-    global max_bin_energies
-    global acting_max_bin_energies
+# binary packets are read into this buffer so decoding does not allocate
+_packet_buffer = bytearray(PACKET_HEADER.size + MAX_BINS * 4)
+_packet_view = memoryview(_packet_buffer)
 
-    # init on first run
-    if max_bin_energies is None:
-        max_bin_energies = np.array([float(0) for i in range(len(bins))])
-        acting_max_bin_energies = max_bin_energies
+# a channel ("l" or "r"), its sequence id and its raw bins
+Packet = Tuple[str, int, NDArray[np.float32]]
 
-    max_bin_energies = np.maximum(bins, max_bin_energies)
 
-    # calculate `acting_max_bin_energies`
-    # subtract a tenth of a percent off each frame
-    # ensure we don't go below zero
-    acting_max_bin_energies = np.maximum(
-        np.subtract(acting_max_bin_energies, 0.1), 0
+class BinNormalizer:
+    """Scales raw bins to a percentage of their recent maximum energy
+
+    The maximum is tracked across every channel given to an instance, so one
+    instance can be shared between both channels or each channel can get its
+    own. All state and scratch space is preallocated, so normalizing does not
+    allocate.
+    """
+
+    def __init__(self, channels: Sequence[str] = ("l", "r")):
+        self._channels = tuple(channels)
+        self._bin_count = 0
+
+    def _allocate(self, bin_count: int) -> None:
+        self._bin_count = bin_count
+        # the actual maximum energy of each bin
+        self._max_bin_energies = np.zeros(bin_count, dtype=np.float32)
+        # what we are treating as the maximum energy of each bin for this frame
+        self._acting_max_bin_energies = np.zeros(bin_count, dtype=np.float32)
+        self._scratch = np.empty(bin_count, dtype=np.float32)
+        self._nonzero = np.empty(bin_count, dtype=np.bool_)
+        self._bins = {
+            channel: np.zeros(bin_count, dtype=np.float32)
+            for channel in self._channels
+        }
+
+    def __call__(
+        self, channel: str, raw_bins: NDArray[np.float32]
+    ) -> NDArray[np.float32]:
+        """Normalize the raw bins of one channel
+
+        Args:
+            channel: the channel the bins are from
+            raw_bins: bins as sent by the Teensy
+
+        Returns:
+            the bins as a percentage (0 to 1) of their maximum. This is a
+                buffer owned by the normalizer and is overwritten the next
+                time this channel is normalized.
+        """
+        if len(raw_bins) != self._bin_count:
+            self._allocate(len(raw_bins))
+
+        bins = self._bins[channel]
+        np.multiply(raw_bins, 100_000, out=bins)
+
+        # chop off noise
+        # TODO: make this unnessesary
+        np.subtract(bins, 1, out=bins)
+        np.maximum(bins, 0, out=bins)
+
+        # make logarithmic
+        # TODO: see if this does anything worthwhile
+        np.power(bins, 0.8, out=bins)
+
+        max_bin_energies = self._max_bin_energies
+        acting_max_bin_energies = self._acting_max_bin_energies
+        np.maximum(bins, max_bin_energies, out=max_bin_energies)
+
+        # calculate `acting_max_bin_energies`
+        # subtract a tenth of a percent off each frame
+        # ensure we don't go below zero
+        np.subtract(acting_max_bin_energies, 0.1, out=acting_max_bin_energies)
+        np.maximum(acting_max_bin_energies, 0, out=acting_max_bin_energies)
+        # don't go below the current bins
+        np.maximum(acting_max_bin_energies, bins, out=acting_max_bin_energies)
+        # don't go below 75% of the actual maximum
+        np.multiply(max_bin_energies, 0.5, out=self._scratch)
+        np.maximum(
+            self._scratch,
+            acting_max_bin_energies,
+            out=acting_max_bin_energies,
+        )
+
+        # the acting max is never below the bins, so it is only zero where the
+        # bins are too; leave those at zero rather than dividing by it
+        np.greater(acting_max_bin_energies, 0, out=self._nonzero)
+        np.divide(bins, acting_max_bin_energies, out=bins, where=self._nonzero)
+
+        return bins
+
+
+def open_port(teensy_port: str) -> BinaryIO:
+    """Open the Teensy's serial port for reading either packet format"""
+    port = open(teensy_port, "rb")
+    if port.isatty():
+        # the line discipline would mangle binary packets
+        tty.setraw(port.fileno())
+    return port
+
+
+def _read_exactly_into(port: BinaryIO, view: memoryview) -> None:
+    while len(view):
+        read = port.readinto(view)  # type: ignore
+        if not read:
+            raise EOFError("Teensy port closed")
+        view = view[read:]
+
+
+def _read_binary_packet(
+    port: BinaryIO,
+) -> Packet | None:
+    # the sync word has already been consumed
+    _read_exactly_into(
+        port, _packet_view[len(PACKET_SYNC) : PACKET_HEADER.size]
     )
-    # don't go below the current bins
-    acting_max_bin_energies = np.maximum(acting_max_bin_energies, bins)
-    # don't go below 75% of the actual maximum
-    max_bin_energies_gate = np.multiply(max_bin_energies, 0.5)
-    acting_max_bin_energies = np.maximum(
-        max_bin_energies_gate, acting_max_bin_energies
+    _, channel, id, bin_count = PACKET_HEADER.unpack_from(_packet_buffer)
+    if channel not in (b"l", b"r") or not bin_count:
+        # not actually a packet, the sync word was part of something else
+        return None
+
+    payload_end = PACKET_HEADER.size + bin_count * 4
+    _read_exactly_into(port, _packet_view[PACKET_HEADER.size : payload_end])
+    raw_bins = np.frombuffer(
+        _packet_buffer,
+        dtype="<f4",
+        count=bin_count,
+        offset=PACKET_HEADER.size,
     )
+    return channel.decode(), id, raw_bins
+
+
+def _parse_text_packet(line: bytes) -> Packet:
+    channel, id, raw_bins_string = line.split(b":")
+    raw_bins = np.array(raw_bins_string.strip().split(b","), dtype=np.float32)
+    return channel.decode(), int(id), raw_bins
+
+
+def read_packet(port: BinaryIO) -> Packet:
+    """Read the next packet of raw bins from the Teensy
+
+    Both the text (`l:<id>:<bin>,<bin>,...`) and binary packet formats are
+    understood, the format is detected per packet. Anything that is neither
+    (such as a partial packet when first connecting) is skipped.
+
+    Args:
+        port: the Teensy's serial port, as opened by `open_port`
+
+    Returns:
+        the channel ("l" or "r"), the sequence id and the raw bins. Bins from
+            a binary packet are a view of a shared buffer, and are only valid
+            until the next call.
+    """
+    while True:
+        lead = port.read(1)
+        if not lead:
+            raise EOFError("Teensy port closed")
+
+        if lead == PACKET_SYNC[:1]:
+            if port.read(1) != PACKET_SYNC[1:]:
+                continue
+            packet = _read_binary_packet(port)
+            if packet is not None:
+                return packet
+
+        elif lead in (b"l", b"r"):
+            line = lead + port.readline()
+            try:
+                return _parse_text_packet(line)
+            except ValueError:
+                # partial or corrupt line
+                continue
+
 
-    np.divide(bins, acting_max_bin_energies, out=bins)
-    # if anything is zero it becomes nan, this deals with that
-    bins = np.nan_to_num(bins)
+def iter_packets(port: BinaryIO) -> Iterator[Packet]:
+    """Read packets from the Teensy until the port is closed"""
+    while True:
+        try:
+            yield read_packet(port)
+        except EOFError:
+            return
 
-    return bins
 
+class BulkReader:
+    """Reads everything waiting on the Teensy's port at once
 
-def _process_bins(raw_bins: numpy.typing.ArrayLike):
+    Only the newest complete left/right pair is handed on, anything older
+    would already be stale by the time it was rendered. Skipping it keeps the
+    latency between the audio and the lights bounded when rendering falls
+    behind. The number of frames skipped is kept in `skipped_frames`.
+    """
 
-    bins = np.multiply(raw_bins, 100_000)
+    def __init__(self, port: BinaryIO, buffer_size: int = 1 << 16):
+        self._fd = port.fileno()
+        os.set_blocking(self._fd, False)
 
-    # chop off noise
-    # TODO: make this unnessesary
-    bins = np.subtract(bins, 1)
-    bins = np.maximum(bins, 0)
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._data = np.frombuffer(self._buffer, dtype=np.uint8)
+        # how much of the buffer holds data
+        self._filled = 0
+        # how much of that data has already been parsed
+        self._consumed = 0
 
-    # make logarithmic
-    # TODO: see if this does anything worthwhile
-    bins = np.power(np.array(bins), 0.8)
+        # the id of the last pair handed on
+        self._last_id: int | None = None
+        # frames that were never handed on, including any lost on the way
+        self.skipped_frames = 0
 
-    bins = _get_bins_as_percentage_of_max(bins)
+    def _drain(self) -> None:
+        # keep the partial packet left over from last time; this is done now
+        # rather than after parsing so the returned bins stay valid until then
+        leftover = self._filled - self._consumed
+        if leftover == len(self._buffer):
+            # the buffer is full of something that is not a packet
+            leftover = 0
+        elif leftover:
+            # the buffer is exported to `_view` and `_data`, so it can only
+            # be copied within, never resized
+            self._data[:leftover] = self._data[self._consumed : self._filled]
+        self._filled = leftover
+        self._consumed = 0
 
-    return bins
+        # wait for something to arrive, then take everything there is
+        select.select([self._fd], [], [])
+        try:
+            read = os.readv(self._fd, [self._view[self._filled :]])
+        except BlockingIOError:
+            return
+        if not read:
+            raise EOFError("Teensy port closed")
+        self._filled += read
+
+    def _find_binary_packets(
+        self, data: NDArray[np.uint8]
+    ) -> Tuple[NDArray[np.intp], NDArray[np.intp], NDArray[np.uint8]]:
+        syncs = np.flatnonzero(
+            (data[:-1] == PACKET_SYNC[0]) & (data[1:] == PACKET_SYNC[1])
+        )
+        starts = syncs[syncs + PACKET_HEADER.size <= len(data)]
+        bin_counts = data[starts + PACKET_HEADER.size - 1].astype(np.intp)
+        ends = starts + PACKET_HEADER.size + bin_counts * 4
+        channels = data[starts + len(PACKET_SYNC)]
+        complete = (
+            (ends <= len(data))
+            & (bin_counts > 0)
+            & ((channels == ord("l")) | (channels == ord("r")))
+            # the sync word can turn up inside a payload too, but real
+            # packets are back to back so they end where another one starts
+            & (np.isin(ends, syncs) | (ends >= len(data) - 1))
+        )
+        return starts[complete], ends[complete], channels[complete]
+
+    def _find_text_packets(
+        self, data: NDArray[np.uint8]
+    ) -> Tuple[NDArray[np.intp], NDArray[np.intp], NDArray[np.uint8]]:
+        ends = np.flatnonzero(data == ord("\n")) + 1
+        starts = np.empty_like(ends)
+        starts[:1] = 0
+        starts[1:] = ends[:-1]
+        return starts, ends, data[starts]
+
+    def _parse_packet(self, start: int, end: int) -> Packet | None:
+        if self._buffer[start : start + len(PACKET_SYNC)] == PACKET_SYNC:
+            _, channel, id, bin_count = PACKET_HEADER.unpack_from(
+                self._buffer, start
+            )
+            raw_bins = np.frombuffer(
+                self._buffer,
+                dtype="<f4",
+                count=bin_count,
+                offset=start + PACKET_HEADER.size,
+            )
+            return channel.decode(), id, raw_bins
+
+        try:
+            return _parse_text_packet(bytes(self._view[start:end]))
+        except ValueError:
+            # partial or corrupt line
+            return None
+
+    def read_latest_pair(
+        self,
+    ) -> Tuple[int, NDArray[np.float32], NDArray[np.float32]]:
+        """Read the newest complete pair of raw bins
+
+        Blocks until a complete pair is available.
+
+        Returns:
+            the sequence id, raw left and raw right bins. The bins may be
+                views of the reader's buffer and are only valid until the
+                next call.
+        """
+        while True:
+            self._drain()
+            data = self._data[: self._filled]
+
+            starts, ends, channels = self._find_binary_packets(data)
+            if not len(starts):
+                starts, ends, channels = self._find_text_packets(data)
+            if not len(starts):
+                continue
+            # everything older than the newest packet is stale, but that one
+            # is kept in case its other channel hasn't arrived yet
+            self._consumed = int(starts[-1])
+
+            # both channels of a frame arrive next to each other, in either
+            # order, and share a sequence id
+            adjacent = np.flatnonzero(
+                ((channels[:-1] == ord("l")) & (channels[1:] == ord("r")))
+                | ((channels[:-1] == ord("r")) & (channels[1:] == ord("l")))
+            )
+
+            for first_index in adjacent[::-1]:
+                first = self._parse_packet(
+                    starts[first_index], ends[first_index]
+                )
+                second = self._parse_packet(
+                    starts[first_index + 1], ends[first_index + 1]
+                )
+                if first is None or second is None or first[1] != second[1]:
+                    continue
+
+                # anything after the pair is newer, so it is kept for next time
+                self._consumed = int(ends[first_index + 1])
+                id = first[1]
+                if self._last_id is not None and id > self._last_id:
+                    self.skipped_frames += id - self._last_id - 1
+                self._last_id = id
+
+                if first[0] == "l":
+                    return id, first[2], second[2]
+                return id, second[2], first[2]
+
+
+class ChannelPairer:
+    """Pairs up left and right packets using their sequence id
+
+    Packets may arrive out of order by up to `reorder_window` frames. A frame
+    that is still missing a channel when a newer frame completes is dropped,
+    as are packets for frames that were already handed on, so a lost or
+    repeated packet never stops the stream.
+
+    Frames that never completed are counted in `missed_frames`, and packets
+    that were received more than once in `duplicate_packets`.
+    """
+
+    def __init__(self, reorder_window: int = 4):
+        self._reorder_window = reorder_window
+        self._bin_count = 0
+        # the id that was last handed on
+        self._last_id: int | None = None
+
+        self.missed_frames = 0
+        self.duplicate_packets = 0
+
+    def _allocate(self, bin_count: int) -> None:
+        self._bin_count = bin_count
+        # each frame in the window gets a slot, indexed by `id % window`
+        self._slots = np.zeros(
+            (self._reorder_window, 2, bin_count), dtype=np.float32
+        )
+        self._slot_ids = np.full(self._reorder_window, -1, dtype=np.int64)
+        self._slot_filled = np.zeros((self._reorder_window, 2), dtype=np.bool_)
+        # whether each slot's frame was handed on, rather than given up on
+        self._slot_handed_on = np.zeros(self._reorder_window, dtype=np.bool_)
+
+    def reset(self) -> None:
+        self._last_id = None
+        if self._bin_count:
+            self._slot_ids[:] = -1
+            self._slot_filled[:] = False
+            self._slot_handed_on[:] = False
+
+    def add(
+        self, channel: str, id: int, raw_bins: NDArray[np.float32]
+    ) -> Tuple[int, NDArray[np.float32], NDArray[np.float32]] | None:
+        """Add a packet, returning the frame it completes if any
+
+        Args:
+            channel: the packet's channel ("l" or "r")
+            id: the packet's sequence id
+            raw_bins: the packet's bins, these are copied
+
+        Returns:
+            the sequence id, left and right bins of the completed frame or
+                `None` if the packet did not complete one. The bins are only
+                valid until `reorder_window` more frames have been added.
+        """
+        if len(raw_bins) != self._bin_count:
+            self._allocate(len(raw_bins))
+            self._last_id = None
+
+        slot = id % self._reorder_window
+        if self._last_id is not None and id <= self._last_id:
+            if self._last_id - id > self._reorder_window:
+                # the ids went backwards, the Teensy must have restarted
+                self.reset()
+            else:
+                # this frame was already handed on, or given up on in which
+                # case the packet is just late
+                if self._slot_ids[slot] == id and self._slot_handed_on[slot]:
+                    self.duplicate_packets += 1
+                return None
+
+        if self._slot_ids[slot] > id:
+            # too late, the slot has moved on to a newer frame; this frame is
+            # counted as missed once that one completes
+            return None
+        if self._slot_ids[slot] != id:
+            # any older frame still in the slot is dropped
+            self._slot_ids[slot] = id
+            self._slot_filled[slot] = False
+            self._slot_handed_on[slot] = False
+
+        channel_index = 0 if channel == "l" else 1
+        if self._slot_filled[slot, channel_index]:
+            self.duplicate_packets += 1
+        self._slots[slot, channel_index] = raw_bins
+        self._slot_filled[slot, channel_index] = True
+
+        if not self._slot_filled[slot].all():
+            return None
+
+        if self._last_id is not None:
+            self.missed_frames += id - self._last_id - 1
+        self._last_id = id
+        self._slot_handed_on[slot] = True
+        # nothing older than this frame will be handed on anymore
+        self._slot_filled[self._slot_ids <= id] = False
+
+        return id, self._slots[slot, 0], self._slots[slot, 1]
 
 
 def get_bins(
-    port: TextIOWrapper,
-):
-    raw_bin_string = next(port)
-    # TODO: something with the ID (log if channel is missed?)
-    channel, id, raw_bins_string = raw_bin_string.split(":")
+    packets: Iterator[Packet],
+    pairer: ChannelPairer,
+    normalizers: Mapping[str, BinNormalizer],
+    trace: tracing.Trace | None = None,
+) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+    """Read packets until a frame is complete, then normalize it
+
+    Args:
+        packets: where packets come from, such as `iter_packets`
+        pairer: pairs the channels of each frame
+        normalizers: the normalizer for each channel
+        trace: stamped when the packet completing the frame was read
 
-    # strip off the last character (newline) and split on the commas
-    raw_bins_string = raw_bins_string[:-1]
+    Returns:
+        the normalized left and right bins
 
-    raw_bins = np.fromstring(raw_bins_string, dtype=float, sep=",")
+    Raises:
+        EOFError: when `packets` runs out
+    """
+    for packet in packets:
+        frame = pairer.add(*packet)
+        if frame is not None:
+            break
+    else:
+        raise EOFError("no more packets")
 
-    bins = _process_bins(raw_bins)
+    if trace is not None:
+        trace.stamp("read")
 
-    return channel, bins
+    _, raw_left, raw_right = frame
+    return normalizers["l"]("l", raw_left), normalizers["r"]("r", raw_right)
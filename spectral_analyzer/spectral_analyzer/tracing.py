@@ -0,0 +1,108 @@
+"""Trace how long each frame spends in each stage of the pipeline."""
+
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+# in the order a frame passes through them
+STAGES = (
+    # its bins were read from the Teensy
+    "read",
+    # the style generated the frame
+    "generated",
+    # it came out of the other end of the frame queue
+    "dequeued",
+    # it was sent to the LED wall server
+    "sent",
+    # the server received it (estimated, see `RemoteLEDWall`)
+    "received",
+    # the LED wall acknowledged it
+    "acked",
+)
+_STAGE_INDEXES = {stage: i for i, stage in enumerate(STAGES)}
+
+# histogram buckets, in seconds, from 10us to 10s
+_BUCKET_EDGES = np.geomspace(1e-5, 10, 181)
+
+
+class Trace:
+    """When a single frame reached each stage"""
+
+    __slots__ = ("timestamps",)
+
+    def __init__(self) -> None:
+        # `time.monotonic()`, NaN until the stage is reached
+        self.timestamps = np.full(len(STAGES), np.nan)
+
+    def stamp(self, stage: str, timestamp: float | None = None) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.timestamps[_STAGE_INDEXES[stage]] = timestamp
+
+    def copy(self) -> "Trace":
+        trace = Trace()
+        trace.timestamps[:] = self.timestamps
+        return trace
+
+
+class LatencyHistograms:
+    """Histograms of how long frames took to reach each stage
+
+    Each stage is timed from the stage before it, and "total" from the first
+    stage to the last one reached.
+    """
+
+    def __init__(self) -> None:
+        self.stages = (*STAGES[1:], "total")
+        self._counts = np.zeros(
+            (len(self.stages), len(_BUCKET_EDGES) + 1), dtype=np.int64
+        )
+
+    def record(self, trace: Trace) -> None:
+        timestamps = trace.timestamps
+        durations = np.empty(len(self.stages))
+        durations[:-1] = np.diff(timestamps)
+        reached = ~np.isnan(timestamps)
+        durations[-1] = (
+            timestamps[reached][-1] - timestamps[0] if reached[0] else np.nan
+        )
+
+        recorded = ~np.isnan(durations)
+        buckets = np.searchsorted(_BUCKET_EDGES, durations[recorded])
+        self._counts[np.flatnonzero(recorded), buckets] += 1
+
+    def percentiles(
+        self, percentiles: Sequence[float] = (50, 95, 99)
+    ) -> Dict[str, NDArray[np.float64]]:
+        """Estimate percentiles of each stage's latency
+
+        Returns:
+            the upper edge (in seconds) of the bucket each percentile falls
+                in, for each stage that has been recorded
+        """
+        results = {}
+        totals = self._counts.sum(axis=1)
+        cumulative = np.cumsum(self._counts, axis=1)
+        # the last bucket is everything above the last edge
+        upper_edges = np.append(_BUCKET_EDGES, np.inf)
+        for stage, stage_cumulative, total in zip(
+            self.stages, cumulative, totals
+        ):
+            if not total:
+                continue
+            ranks = np.asarray(percentiles) / 100 * total
+            buckets = np.searchsorted(stage_cumulative, ranks)
+            results[stage] = upper_edges[buckets]
+        return results
+
+    def report(self) -> str:
+        """A table of the p50, p95 and p99 latency of each stage"""
+        lines = [f"{'stage':>10} {'p50':>9} {'p95':>9} {'p99':>9}"]
+        for stage, latencies in self.percentiles().items():
+            columns = " ".join(
+                f"{latency * 1000:7.2f}ms" for latency in latencies
+            )
+            lines.append(f"{stage:>10} {columns}")
+        return "\n".join(lines)
@@ -0,0 +1,105 @@
+"""test that audio is analyzed into the bands the Teensy would send"""
+
+import wave
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import analysis, bin_mapping
+
+SAMPLE_RATE = analysis.TEENSY_SAMPLE_RATE
+
+
+def teensy_band(freq: float) -> int:
+    return int(np.searchsorted(analysis.teensy_band_edges(), freq)) - 1
+
+
+def write_wav(path, samples: np.ndarray, sample_width: int) -> None:
+    """Write float samples between -1 and 1, (samples, channels)"""
+    if sample_width == 1:
+        raw_samples = np.rint(samples * 127 + 128).astype(np.uint8)
+    else:
+        dtype = np.dtype(f"<i{sample_width}")
+        raw_samples = np.rint(samples * np.iinfo(dtype).max).astype(dtype)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(samples.shape[1])
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(raw_samples.tobytes())
+
+
+def sine(freq: float, seconds: float = 0.25, amplitude: float = 0.5):
+    return amplitude * np.sin(
+        2 * np.pi * freq * np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    )
+
+
+def test_teensy_weights():
+    mapping = bin_mapping.mapping_from_edges(
+        SAMPLE_RATE,
+        analysis.TEENSY_FFT_SIZE,
+        tuple(analysis.teensy_band_edges()),
+    )
+    # every band sums exactly the bins `fft.read(first, last)` does
+    expected = np.zeros_like(mapping.weights)
+    for band, (first, last) in enumerate(analysis.TEENSY_BIN_RANGES):
+        expected[first : last + 1, band] = 1
+    assert np.array_equal(mapping.weights, expected)
+
+
+def test_erb_weights():
+    mapping = bin_mapping.band_mapping(SAMPLE_RATE, 1024, 64)
+    assert mapping.weights.shape == (mapping.stop, 64)
+    # each bin is shared out between the bands it overlaps
+    bin_width = SAMPLE_RATE / 1024
+    centers = np.fft.rfftfreq(1024, 1 / SAMPLE_RATE)[: mapping.stop]
+    inside = centers + bin_width / 2 <= bin_mapping.DEFAULT_HIGH_FREQ
+    assert np.allclose(mapping.weights[inside].sum(axis=1), 1)
+    # and no band is left without any of them
+    assert (mapping.weights.sum(axis=0) > 0).all()
+
+
+@pytest.mark.parametrize("freq", [100, 440, 1000, 5000, 12000])
+def test_sine_lands_in_its_band(freq: float):
+    analyzer = analysis.FFTAnalyzer(SAMPLE_RATE, channels=1)
+    bands = analyzer(sine(freq)[:, None].astype(np.float32))
+    assert bands.shape[1:] == (1, len(analysis.TEENSY_BIN_RANGES))
+    assert (bands[:, 0].argmax(axis=1) == teensy_band(freq)).all()
+
+
+@pytest.mark.parametrize("sample_width", [1, 2, 4])
+def test_wav_packets(tmp_path, sample_width: int):
+    path = tmp_path / "sine.wav"
+    left_freq, right_freq = 440, 5000
+    write_wav(
+        path,
+        np.stack((sine(left_freq), sine(right_freq)), axis=1),
+        sample_width,
+    )
+
+    packets = list(analysis.wav_packets(path, paced=False))
+    # a window every half FFT, and a packet for each channel of it
+    hop_size = analysis.TEENSY_FFT_SIZE // 2
+    windows = (len(sine(0)) - analysis.TEENSY_FFT_SIZE) // hop_size + 1
+    assert len(packets) == 2 * windows
+    for index, (channel, id, bins) in enumerate(packets):
+        assert channel == "lr"[index % 2]
+        assert id == index // 2
+        freq = left_freq if channel == "l" else right_freq
+        assert bins.argmax() == teensy_band(freq)
+
+
+def test_mono_wav_is_both_channels(tmp_path):
+    path = tmp_path / "sine.wav"
+    write_wav(path, sine(1000)[:, None], 2)
+    packets = list(analysis.wav_packets(path, paced=False))
+    for left, right in zip(packets[::2], packets[1::2]):
+        assert np.array_equal(left[2], right[2])
+
+
+def test_blocks_are_carried_over():
+    samples = sine(1000, seconds=0.5)[:, None].astype(np.float32)
+    whole = analysis.FFTAnalyzer(SAMPLE_RATE, channels=1)(samples)
+    analyzer = analysis.FFTAnalyzer(SAMPLE_RATE, channels=1)
+    split = np.concatenate([analyzer(block) for block in np.split(samples, 7)])
+    assert np.allclose(split, whole, atol=1e-6)
@@ -0,0 +1,143 @@
+"""test that BulkReader pairs channels however they are split across reads"""
+
+import os
+import pty
+import threading
+import time
+import tty
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import teensy_reciever
+
+BINS_QTY = 24
+
+
+def text_packet(channel: str, id: int, bins: np.ndarray) -> bytes:
+    bins_string = ",".join(f"{bin:.16f}" for bin in bins)
+    return f"{channel}:{id}:{bins_string}\r\n".encode()
+
+
+def binary_packet(channel: str, id: int, bins: np.ndarray) -> bytes:
+    header = teensy_reciever.PACKET_HEADER.pack(
+        teensy_reciever.PACKET_SYNC, channel.encode(), id, len(bins)
+    )
+    return header + bins.astype("<f4").tobytes()
+
+
+def bins_for(channel: str, id: int) -> np.ndarray:
+    # tells every packet apart
+    return np.full(BINS_QTY, id + (0.5 if channel == "r" else 0), np.float32)
+
+
+@pytest.fixture
+def teensy(request):
+    # a test can ask for a smaller buffer with `indirect`
+    buffer_size = getattr(request, "param", 1 << 16)
+    controller, device = pty.openpty()
+    tty.setraw(device)
+    with open(device, "rb", buffering=0) as port:
+        yield controller, teensy_reciever.BulkReader(port, buffer_size)
+    os.close(controller)
+
+
+def read_in_background(reader: teensy_reciever.BulkReader):
+    """Start reading a pair, returns a function that waits for it"""
+    result = []
+
+    def read():
+        id, left, right = reader.read_latest_pair()
+        result.append((id, left.copy(), right.copy()))
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+
+    def wait():
+        thread.join(timeout=2)
+        assert result, "no pair was read"
+        return result[0]
+
+    return wait
+
+
+def assert_pair(pair, id: int):
+    read_id, left, right = pair
+    assert read_id == id
+    assert np.array_equal(left, bins_for("l", id))
+    assert np.array_equal(right, bins_for("r", id))
+
+
+@pytest.mark.parametrize("make_packet", [text_packet, binary_packet])
+@pytest.mark.parametrize("first_channel", ["l", "r"])
+def test_pair_split_across_reads(make_packet, first_channel: str, teensy):
+    controller, reader = teensy
+    second_channel = "r" if first_channel == "l" else "l"
+    for id in range(3):
+        wait = read_in_background(reader)
+        os.write(
+            controller,
+            make_packet(first_channel, id, bins_for(first_channel, id)),
+        )
+        # long enough for the reader to take the first packet on its own
+        time.sleep(0.05)
+        os.write(
+            controller,
+            make_packet(second_channel, id, bins_for(second_channel, id)),
+        )
+        assert_pair(wait(), id)
+    assert reader.skipped_frames == 0
+
+
+@pytest.mark.parametrize("make_packet", [text_packet, binary_packet])
+def test_newest_pair_is_read(make_packet, teensy):
+    controller, reader = teensy
+    # two whole frames and the first half of a third at once
+    os.write(
+        controller,
+        b"".join(
+            make_packet(channel, id, bins_for(channel, id))
+            for id, channel in [
+                (0, "l"),
+                (0, "r"),
+                (1, "l"),
+                (1, "r"),
+                (2, "l"),
+            ]
+        ),
+    )
+    assert_pair(read_in_background(reader)(), 1)
+    assert reader.skipped_frames == 0
+
+    # the half frame is kept until the rest of it arrives
+    wait = read_in_background(reader)
+    os.write(controller, make_packet("r", 2, bins_for("r", 2)))
+    assert_pair(wait(), 2)
+
+    # frames that are never read are counted
+    os.write(
+        controller,
+        b"".join(
+            make_packet(channel, id, bins_for(channel, id))
+            for id in (3, 4, 5)
+            for channel in "lr"
+        ),
+    )
+    assert_pair(read_in_background(reader)(), 5)
+    assert reader.skipped_frames == 2
+
+
+@pytest.mark.parametrize("teensy", [256], indirect=True)
+def test_buffer_full_of_garbage(teensy):
+    controller, reader = teensy
+    wait = read_in_background(reader)
+    # more than the buffer holds, with nothing in it that looks like a packet
+    os.write(controller, b"x" * 300)
+    time.sleep(0.05)
+    os.write(
+        controller,
+        b"".join(
+            binary_packet(channel, 0, bins_for(channel, 0)) for channel in "lr"
+        ),
+    )
+    assert_pair(wait(), 0)
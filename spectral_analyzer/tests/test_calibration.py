@@ -0,0 +1,114 @@
+"""test that the LED wall's colors are calibrated and put in its order"""
+
+import socket
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import calibration, remote_led_wall
+from spectral_analyzer.calibration import Calibration
+
+WIDTH = 5
+HEIGHT = 4
+
+
+def test_identity():
+    tables = Calibration().tables()
+    assert tables.shape == (calibration.CHANNELS * 256,)
+    assert tables.dtype == np.uint8
+    assert np.array_equal(
+        tables.reshape(calibration.CHANNELS, 256),
+        np.tile(np.arange(256), (calibration.CHANNELS, 1)),
+    )
+
+
+def test_brightness_and_white_point():
+    levels = Calibration(white_point=(255, 200, 100), brightness=0.5).levels()
+    red, green, blue = levels.reshape(calibration.CHANNELS, 256)
+    values = np.arange(256) / 255
+    assert np.allclose(red, values * 127.5)
+    assert np.allclose(green, values * 100)
+    assert np.allclose(blue, values * 50)
+
+
+def test_gamma():
+    tables = Calibration(gamma=(1, 2.2, 0.5)).tables()
+    red, green, blue = tables.reshape(calibration.CHANNELS, 256).astype(int)
+    assert np.array_equal(red, np.arange(256))
+    # darker and brighter in between, the same at the ends
+    assert (green[1:-1] <= red[1:-1]).all() and (green < red).any()
+    assert (blue[1:-1] >= red[1:-1]).all() and (blue > red).any()
+    for channel in (red, green, blue):
+        assert channel[0] == 0 and channel[-1] == 255
+
+
+def test_levels_are_clipped():
+    levels = Calibration(white_point=(255, 255, 255), brightness=2).levels()
+    assert levels.max() == 255
+
+
+def test_per_channel():
+    assert calibration._per_channel(2.2, "gamma") == (2.2, 2.2, 2.2)
+    assert calibration._per_channel([1, 2, 3], "gamma") == (1, 2, 3)
+    with pytest.raises(ValueError):
+        calibration._per_channel([2.2, 2.2], "gamma")
+
+
+def test_load(tmp_path):
+    path = tmp_path / "calibration.toml"
+    path.write_text("gamma = [2.2, 2.0, 1.8]\nwhite_point = 200\n")
+    assert Calibration.load(path, brightness=0.5) == Calibration(
+        gamma=(2.2, 2.0, 1.8), white_point=(200, 200, 200), brightness=0.5
+    )
+
+
+def test_load_defaults(tmp_path):
+    path = tmp_path / "calibration.toml"
+    path.write_text("")
+    assert Calibration.load(path) == Calibration()
+
+
+def test_load_rejects_wrong_channels(tmp_path):
+    path = tmp_path / "calibration.toml"
+    path.write_text("gamma = [2.2, 2.2]\n")
+    with pytest.raises(ValueError):
+        Calibration.load(path)
+
+
+@pytest.fixture
+def wall(tmp_path):
+    path = tmp_path / "calibration.toml"
+    path.write_text("gamma = [1, 2.2, 0.5]\nwhite_point = [255, 200, 150]\n")
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        port = listener.getsockname()[1]
+        wall = remote_led_wall.RemoteLEDWall(
+            WIDTH,
+            HEIGHT,
+            f"127.0.0.1:{port}",
+            brightness=80,
+            calibration_file=str(path),
+        )
+        server, _ = listener.accept()
+    with wall.led_wall_connection, server:
+        yield wall, Calibration.load(path, 0.8)
+
+
+def test_to_led_frame(wall):
+    wall, led_calibration = wall
+    frame = np.random.default_rng(0).integers(
+        0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8
+    )
+
+    # mirrored left to right, every other row backwards, then bottom up
+    rgb = frame[:, ::-1, :3].copy()
+    rgb[1::2] = rgb[1::2, ::-1]
+    rgb = rgb[::-1]
+    tables = led_calibration.tables().reshape(calibration.CHANNELS, 256)
+    expected = np.stack(
+        [tables[channel][rgb[..., channel]] for channel in range(3)],
+        axis=-1,
+    )
+
+    assert np.array_equal(wall._to_led_frame(frame), expected.reshape(-1))
+    # and again, with the buffers it reuses
+    assert np.array_equal(wall._to_led_frame(frame), expected.reshape(-1))
@@ -0,0 +1,76 @@
+"""test that captures replay the packets they recorded"""
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import capture
+
+BINS_QTY = 24
+
+
+def packets(count: int):
+    rng = np.random.default_rng(0)
+    return [
+        (channel, id, rng.random(BINS_QTY, dtype=np.float32))
+        for id in range(count)
+        for channel in "lr"
+    ]
+
+
+def record(path, recorded_packets) -> int:
+    with open(path, "wb") as capture_file:
+        return capture.record(iter(recorded_packets), capture_file)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "capture.bin"
+    recorded = packets(5)
+    assert record(path, recorded) == len(recorded)
+
+    records = capture.load(path)
+    assert len(records) == len(recorded)
+    assert (np.diff(records["timestamp"]) >= 0).all()
+
+    replayed = list(capture.replay(path, speed=0))
+    assert len(replayed) == len(recorded)
+    for (channel, id, bins), (
+        replayed_channel,
+        replayed_id,
+        replayed_bins,
+    ) in zip(recorded, replayed):
+        assert replayed_channel == channel
+        assert replayed_id == id
+        assert np.array_equal(replayed_bins, bins)
+
+
+def test_record_cut_short(tmp_path):
+    path = tmp_path / "capture.bin"
+    record(path, packets(2))
+    with open(path, "r+b") as capture_file:
+        capture_file.truncate(capture_file.seek(0, 2) - 3)
+    assert len(capture.load(path)) == 3
+
+
+def test_no_packets(tmp_path):
+    path = tmp_path / "capture.bin"
+    assert record(path, []) == 0
+    with pytest.raises(ValueError, match="no packets"):
+        capture.load(path)
+
+
+def test_header_only(tmp_path):
+    path = tmp_path / "capture.bin"
+    path.write_bytes(
+        capture.CAPTURE_HEADER.pack(
+            capture.CAPTURE_MAGIC, capture.CAPTURE_VERSION, BINS_QTY
+        )
+    )
+    with pytest.raises(ValueError, match="no records"):
+        capture.load(path)
+
+
+def test_not_a_capture(tmp_path):
+    path = tmp_path / "capture.bin"
+    path.write_bytes(b"l:0:0.1,0.2\r\n" * 4)
+    with pytest.raises(ValueError, match="not a capture"):
+        capture.load(path)
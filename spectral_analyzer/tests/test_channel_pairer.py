@@ -0,0 +1,78 @@
+"""test that ChannelPairer pairs channels by id and counts what went wrong"""
+
+from typing import List
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import teensy_reciever
+
+BINS_QTY = 24
+
+
+def bins_for(channel: str, id: int) -> np.ndarray:
+    # tells every packet apart
+    return np.full(BINS_QTY, id + (0.5 if channel == "r" else 0), np.float32)
+
+
+@pytest.mark.parametrize(
+    "packets,paired_ids,missed_frames,duplicate_packets",
+    [
+        # in order
+        ("l0 r0 l1 r1 l2 r2", [0, 1, 2], 0, 0),
+        ("r0 l0 r1 l1", [0, 1], 0, 0),
+        # lost
+        ("l0 r0 l1 l2 r2 l3 r3", [0, 2, 3], 1, 0),
+        ("l0 r0 r3 l3", [0, 3], 2, 0),
+        # reordered within the window
+        ("l0 r0 l2 l1 r1 r2", [0, 1, 2], 0, 0),
+        ("l1 l0 r0 r1", [0, 1], 0, 0),
+        # reordered so late that a newer frame completed first, the late
+        # frame is given up on
+        ("l0 r0 l1 l2 r2 r1", [0, 2], 1, 0),
+        # reordered out of the window, the newer frame takes the slot
+        ("l0 r0 l1 l5 r5 r1", [0, 5], 4, 0),
+        # repeated
+        ("l0 r0 r0 l1 r1", [0, 1], 0, 1),
+        ("l0 l0 r0 l1 r1 l1 r1", [0, 1], 0, 3),
+        # restarted, the ids went back further than the window
+        ("l9 r9 l10 r10 l0 r0 l1 r1", [9, 10, 0, 1], 0, 0),
+        # but going back within the window is a repeat
+        ("l9 r9 l10 r10 l9 r9 l11 r11", [9, 10, 11], 0, 2),
+    ],
+)
+def test_channel_pairer(
+    packets: str,
+    paired_ids: List[int],
+    missed_frames: int,
+    duplicate_packets: int,
+):
+    pairer = teensy_reciever.ChannelPairer(reorder_window=4)
+    paired = []
+    for packet in packets.split():
+        channel, id = packet[0], int(packet[1:])
+        pair = pairer.add(channel, id, bins_for(channel, id))
+        if pair is not None:
+            pair_id, left, right = pair
+            assert np.array_equal(left, bins_for("l", pair_id))
+            assert np.array_equal(right, bins_for("r", pair_id))
+            paired.append(pair_id)
+
+    assert paired == paired_ids
+    assert pairer.missed_frames == missed_frames
+    assert pairer.duplicate_packets == duplicate_packets
+
+
+def test_bin_count_change_restarts():
+    pairer = teensy_reciever.ChannelPairer()
+    pairer.add("l", 5, bins_for("l", 5))
+    pairer.add("r", 5, bins_for("r", 5))
+
+    # a Teensy sending different bins has been swapped in
+    pairer.add("l", 0, np.zeros(12, np.float32))
+    id, left, right = pairer.add("r", 0, np.ones(12, np.float32))
+    assert id == 0
+    assert np.array_equal(left, np.zeros(12))
+    assert np.array_equal(right, np.ones(12))
+    assert pairer.missed_frames == 0
+    assert pairer.duplicate_packets == 0
@@ -0,0 +1,95 @@
+"""test that colors are transformed like `colorsys` would"""
+
+import colorsys
+
+import numpy as np
+import pytest
+
+from spectral_analyzer.frame_generation import color_transform
+from spectral_analyzer.frame_generation.color_transform import ColorTransform
+
+
+def random_colors(shape=(16, 32)) -> np.ndarray:
+    colors = np.random.default_rng(0).integers(
+        0, 256, (*shape, 4), dtype=np.uint8
+    )
+    # greys, black and white, where the hue is undefined
+    colors[0, :4, :3] = [
+        [0, 0, 0],
+        [255, 255, 255],
+        [128, 128, 128],
+        [1, 1, 1],
+    ]
+    return colors
+
+
+def reference(colors: np.ndarray, transform: ColorTransform) -> np.ndarray:
+    """`ColorTransformer` one color at a time with `colorsys`"""
+    transformed = colors.copy()
+    for color in transformed.reshape(-1, 4):
+        hue, saturation, value = colorsys.rgb_to_hsv(*(color[:3] / 255))
+        rgb = colorsys.hsv_to_rgb(
+            (hue + transform.hue_shift) % 1,
+            min(max(saturation * transform.saturation, 0), 1),
+            min(max(value * transform.value, 0), 1),
+        )
+        color[:3] = np.rint(np.power(rgb, transform.gamma) * 255)
+    return transformed
+
+
+def test_round_trip():
+    colors = random_colors()
+    # all the way around, so converted to HSV and back without changing
+    transformed = color_transform.transform_colors(
+        colors, ColorTransform(hue_shift=1)
+    )
+    assert np.array_equal(transformed, colors)
+
+
+def test_identity():
+    colors = random_colors()
+    out = np.empty_like(colors)
+    transformer = color_transform.ColorTransformer(colors.shape)
+    assert transformer(colors, color_transform.IDENTITY, out) is out
+    assert np.array_equal(out, colors)
+
+
+@pytest.mark.parametrize(
+    "transform",
+    [
+        ColorTransform(hue_shift=0.25),
+        ColorTransform(hue_shift=-0.4),
+        ColorTransform(hue_shift=1 / 3),
+        ColorTransform(saturation=0.5),
+        ColorTransform(saturation=2),
+        ColorTransform(value=0.3),
+        ColorTransform(value=1.5),
+        ColorTransform(gamma=2.2),
+        ColorTransform(0.25, 0.8, 0.9, 2.2),
+    ],
+)
+def test_matches_colorsys(transform: ColorTransform):
+    colors = random_colors()
+    transformed = color_transform.transform_colors(colors, transform)
+    expected = reference(colors, transform)
+    difference = np.abs(transformed.astype(int) - expected)
+    assert difference.max() <= 1
+    # alpha is left alone
+    assert np.array_equal(transformed[..., 3], colors[..., 3])
+
+
+def test_in_place():
+    colors = random_colors()
+    transform = ColorTransform(hue_shift=0.25)
+    expected = color_transform.transform_colors(colors, transform)
+    transformer = color_transform.ColorTransformer(colors.shape)
+    transformer(colors, transform, colors)
+    assert np.array_equal(colors, expected)
+
+
+def test_wrong_shape():
+    transformer = color_transform.ColorTransformer((2, 3, 4))
+    with pytest.raises(ValueError):
+        transformer(np.zeros((3, 2, 4), dtype=np.uint8), ColorTransform(0.5))
+    with pytest.raises(ValueError):
+        color_transform.ColorTransformer((2, 3))
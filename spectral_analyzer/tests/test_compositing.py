@@ -0,0 +1,69 @@
+"""test that layers are blended like they would be in floating point"""
+
+import numpy as np
+import pytest
+
+from spectral_analyzer.frame_generation import compositing, registry
+
+WIDTH = 48
+HEIGHT = 27
+
+
+def bins(seed: int):
+    rng = np.random.default_rng(seed)
+    return rng.random(WIDTH // 2), rng.random(WIDTH // 2)
+
+
+def style(name: str):
+    return registry.styles[name](WIDTH, HEIGHT, "rainbow")
+
+
+def over(under: np.ndarray, frame: np.ndarray, opacity: float) -> np.ndarray:
+    """`frame` drawn over `under` in floating point"""
+    # the compositor's opacities are out of 256
+    weights = frame[..., 3:] / 255 * round(opacity * 256) / 256
+    opaque_frame = frame.astype(np.float64)
+    opaque_frame[..., 3] = 255
+    return under * (1 - weights) + opaque_frame * weights
+
+
+@pytest.mark.parametrize("name", ["bottom_up", "center_out", "mouth"])
+def test_one_opaque_layer(name: str):
+    left, right = bins(0)
+    compositor = compositing.Compositor([(style(name), 1)])
+    assert np.array_equal(compositor(left, right), style(name)(left, right))
+
+
+@pytest.mark.parametrize("opacity", [0.3, 0.5, 1])
+def test_blend(opacity: float):
+    left, right = bins(1)
+    compositor = compositing.Compositor(
+        [(style("bottom_up"), 1), (style("center_out"), opacity)]
+    )
+    frame = compositor(left, right)
+
+    expected = over(
+        over(np.zeros(frame.shape), style("bottom_up")(left, right), 1),
+        style("center_out")(left, right),
+        opacity,
+    )
+    # only ever rounded down
+    difference = expected - frame
+    assert ((0 <= difference) & (difference < 1)).all()
+    # the layers do overlap, and don't cover each other fully
+    assert (difference > 0).any() or opacity == 1
+
+
+def test_no_layers():
+    with pytest.raises(ValueError):
+        compositing.Compositor([])
+
+
+def test_mismatched_layers():
+    with pytest.raises(ValueError):
+        compositing.Compositor(
+            [
+                (style("bottom_up"), 1),
+                (registry.styles["top_down"](WIDTH, HEIGHT + 1, "rainbow"), 1),
+            ]
+        )
@@ -0,0 +1,49 @@
+"""test how styles fit bins to their columns and change over time"""
+
+import numpy as np
+import pytest
+
+from spectral_analyzer.frame_generation import display_styles, registry
+
+WIDTH = 48
+HEIGHT = 27
+
+
+@pytest.mark.parametrize("direction", ["vertical", "diagonal", "per_column"])
+def test_shifting_hue_cache(monkeypatch, direction: str):
+    rng = np.random.default_rng(0)
+    left = rng.random(WIDTH // 2)
+    right = rng.random(WIDTH // 2)
+
+    def draw(style, time: float) -> np.ndarray:
+        monkeypatch.setattr(display_styles.time, "monotonic", lambda: time)
+        return style(left, right).copy()
+
+    def new_style():
+        return registry.styles["shifting_hue"](
+            WIDTH, HEIGHT, "rainbow", direction
+        )
+
+    style = new_style()
+    first = draw(style, 1)
+    second = draw(style, 6)
+    assert not np.array_equal(first, second)
+    # drawn from the cache, the same as it was drawn the first time
+    assert np.array_equal(draw(style, 1), first)
+    assert np.array_equal(draw(style, 6), second)
+    assert np.array_equal(draw(new_style(), 6), second)
+
+
+@pytest.mark.parametrize(
+    "bin_count,width", [(24, 24), (24, 48), (24, 12), (16, 24), (37, 24)]
+)
+def test_resampling_matrix(bin_count: int, width: int):
+    bins = np.random.default_rng(0).random(bin_count)
+    weights = display_styles.resampling_matrix(bin_count, width)
+    assert weights.shape == (bin_count, width)
+    assert display_styles.resampling_matrix(bin_count, width) is weights
+
+    # every bin repeated as many times as there are columns, then evenly
+    # split between the columns
+    expected = np.repeat(bins, width).reshape(width, bin_count).mean(axis=1)
+    assert np.allclose(bins @ weights, expected, atol=1e-6)
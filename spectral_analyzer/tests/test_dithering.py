@@ -0,0 +1,47 @@
+"""test that dithering shows levels between the LEDs' on average"""
+
+import numpy as np
+import pytest
+
+from spectral_analyzer import dithering
+
+SIZE = 64
+# enough frames for the error of every byte to come around
+FRAMES = 1 << dithering.FRACTION_BITS
+
+
+def dither_frames(levels: np.ndarray, indexes: np.ndarray) -> np.ndarray:
+    dither = dithering.TemporalDither(levels, len(indexes))
+    frames = np.empty((FRAMES, len(indexes)), dtype=np.uint8)
+    for frame in frames:
+        assert dither(indexes, frame) is frame
+    return frames
+
+
+def test_whole_levels():
+    indexes = np.random.default_rng(0).integers(0, 256, SIZE)
+    frames = dither_frames(np.arange(256, dtype=np.float64), indexes)
+    assert (frames == indexes).all()
+
+
+@pytest.mark.parametrize("level", [0.5, 3.3, 10.25, 254.9])
+def test_fractional_levels(level: float):
+    frames = dither_frames(np.array([level]), np.zeros(SIZE, dtype=np.intp))
+    # only ever the levels either side
+    assert set(np.unique(frames)) <= {int(level), int(level) + 1}
+    # and over time, each byte averages out to the level
+    assert np.allclose(
+        frames.mean(axis=0), level, atol=1 / (1 << dithering.FRACTION_BITS)
+    )
+    # not all stepping up on the same frames
+    assert len(np.unique(frames, axis=1)) > 1
+
+
+@pytest.mark.parametrize("level", [255, 255.9, 300])
+def test_no_overflow(level: float):
+    dither = dithering.TemporalDither(np.array([level]), SIZE)
+    # the most error that can be carried in
+    dither._errors[:] = (1 << dithering.FRACTION_BITS) - 1
+    out = np.empty(SIZE, dtype=np.uint8)
+    dither(np.zeros(SIZE, dtype=np.intp), out)
+    assert (out == 255).all()
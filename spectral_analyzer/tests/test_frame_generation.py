@@ -0,0 +1,50 @@
+"""test that frames reach every output without a slow one holding them up"""
+
+import multiprocessing as mp
+import queue
+import time
+
+import numpy as np
+
+from spectral_analyzer.frame_generation import frame_generation
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((2, 2, 3), value, dtype=np.uint8)
+
+
+def test_send_frame():
+    frame_queues = [
+        queue.Queue(maxsize=frame_generation.FRAME_QUEUE_SIZE)
+        for _ in range(2)
+    ]
+    frame_generation._send_frame(frame(0), None, frame_queues)
+    # one output keeps up, the other doesn't take any frames
+    assert frame_queues[0].get_nowait()[0][0, 0, 0] == 0
+    for value in range(1, 5):
+        frame_generation._send_frame(frame(value), None, frame_queues)
+        assert frame_queues[0].get_nowait()[0][0, 0, 0] == value
+
+    # the stalled one is left with the newest frames
+    values = []
+    while not frame_queues[1].empty():
+        values.append(frame_queues[1].get_nowait()[0][0, 0, 0])
+    assert values == list(range(5 - frame_generation.FRAME_QUEUE_SIZE, 5))
+
+
+def test_send_frame_never_blocks():
+    frame_queue = mp.Queue(maxsize=frame_generation.FRAME_QUEUE_SIZE)
+    try:
+        for value in range(frame_generation.FRAME_QUEUE_SIZE):
+            frame_generation._send_frame(frame(value), None, [frame_queue])
+        # as long as an output stalls, its frames are through the pipe
+        time.sleep(0.1)
+        # would block forever if the queue's `put` did
+        frame_generation._send_frame(frame(9), None, [frame_queue])
+        values = [
+            frame_queue.get(timeout=1)[0][0, 0, 0]
+            for _ in range(frame_generation.FRAME_QUEUE_SIZE)
+        ]
+        assert values[-1] == 9
+    finally:
+        frame_queue.close()
@@ -0,0 +1,139 @@
+"""test that every style still draws the same frames
+
+The golden frames were first drawn by the styles as they were before they
+were vectorized. Since then, gradients have been blended with `np.interp`
+and shifting_hue's hues have been rounded differently, each off by one at
+most. Frames drawn from more or fewer bins than there are columns were
+first drawn after the bins were resampled to fit (the styles only drew the
+first of them before). Only after checking that a change to the frames is
+intended, redraw them with:
+
+    python -m tests.test_golden_frames
+"""
+
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pytest
+
+from spectral_analyzer.frame_generation import display_styles, registry
+
+GOLDEN_FRAMES = Path(__file__).parent / "data" / "golden_frames.npz"
+
+STYLES = (
+    "bottom_up",
+    "top_down",
+    "per_bin_color",
+    "shifting_hue",
+    "center_out",
+    "mouth",
+)
+GRADIENTS = ("rainbow", "irish")
+# (width, height), odd and even of each
+SIZES = ((48, 27), (48, 28), (47, 27), (96, 27))
+# bins that are resampled to the columns, fewer and more than there are
+RESAMPLED_BIN_COUNTS = (16, 37)
+# when shifting_hue's frames are drawn, it picks its hue by the time
+TIME = 12.5
+
+
+def bins(
+    width: int, bin_count: int | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Two frames of left and right bins, a bin per column by default"""
+    rng = np.random.default_rng(width)
+    if bin_count is None:
+        bin_count = width // 2 + width % 2
+    left = rng.random((2, bin_count))
+    right = rng.random((2, bin_count))
+    # silence, full and just under full
+    left[1, :3] = (0, 1, 0.999)
+    right[1, -3:] = (1, 0, 0.5)
+    return left, right
+
+
+def draw(
+    style: str,
+    gradient: str,
+    width: int,
+    height: int,
+    bin_count: int | None = None,
+) -> np.ndarray:
+    left, right = bins(width, bin_count)
+    generate_frame = registry.styles[style](width, height, gradient)
+    return np.stack(
+        [generate_frame(left[i], right[i]).copy() for i in range(len(left))]
+    )
+
+
+def key(
+    style: str,
+    gradient: str,
+    width: int,
+    height: int,
+    bin_count: int | None = None,
+) -> str:
+    if bin_count is None:
+        return f"{style}-{gradient}-{width}x{height}"
+    return f"{style}-{gradient}-{width}x{height}-{bin_count}bins"
+
+
+def cases() -> Iterator[Tuple[str, str, int, int, int | None]]:
+    """Every frame drawn, as the arguments of `draw`"""
+    for style in STYLES:
+        for width, height in SIZES:
+            for gradient in GRADIENTS:
+                yield style, gradient, width, height, None
+            for bin_count in RESAMPLED_BIN_COUNTS:
+                yield style, GRADIENTS[0], width, height, bin_count
+
+
+@pytest.fixture(scope="module")
+def golden_frames():
+    with np.load(GOLDEN_FRAMES) as golden_frames:
+        yield dict(golden_frames)
+
+
+@pytest.fixture(autouse=True)
+def fixed_time(monkeypatch):
+    monkeypatch.setattr(display_styles.time, "monotonic", lambda: TIME)
+
+
+@pytest.mark.parametrize(
+    "style,gradient,width,height,bin_count", list(cases())
+)
+def test_golden_frames(
+    style: str,
+    gradient: str,
+    width: int,
+    height: int,
+    bin_count: int | None,
+    golden_frames: Dict[str, np.ndarray],
+):
+    golden = golden_frames[key(style, gradient, width, height, bin_count)]
+    assert np.array_equal(
+        draw(style, gradient, width, height, bin_count), golden
+    )
+
+    # and all at once
+    left, right = bins(width, bin_count)
+    generate_frame = registry.styles[style](width, height, gradient)
+    batch = generate_frame.render_batch(
+        left, right, times=np.full(len(left), TIME)
+    )
+    assert np.array_equal(batch, golden)
+
+
+def save() -> None:
+    golden_frames = {}
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(display_styles.time, "monotonic", lambda: TIME)
+        for case in cases():
+            golden_frames[key(*case)] = draw(*case)
+    GOLDEN_FRAMES.parent.mkdir(exist_ok=True)
+    np.savez_compressed(GOLDEN_FRAMES, **golden_frames)
+
+
+if __name__ == "__main__":
+    save()
@@ -0,0 +1,179 @@
+"""test that gradients are blended between their stops, and cached"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from spectral_analyzer.frame_generation import gradient
+from spectral_analyzer.frame_generation.gradient import RGBA
+
+BLACK = RGBA(0, 0, 0)
+WHITE = RGBA(255, 255, 255)
+RED = RGBA(255, 0, 0)
+STOPS = [(0, BLACK), (0.5, RED), (1, WHITE)]
+# a gradient file for testing the raster cache
+SVG = """<svg height="100%" width="100%">
+    <defs>
+        <linearGradient id="0" x1="0.5" y1="0" x2="0.5" y2="1">
+            <stop offset="0%" stop-color="{}" />
+            <stop offset="100%" stop-color="#ffffff" />
+        </linearGradient>
+    </defs>
+</svg>
+"""
+
+
+def test_gen_gradient():
+    gradient_array = gradient.gen_gradient(10, STOPS)
+    assert gradient_array.shape == (10, 4)
+    assert gradient_array.dtype == np.uint8
+    # each segment runs from the stop before it to its own stop
+    assert gradient_array[0].tolist() == list(BLACK)
+    assert gradient_array[4].tolist() == list(RED)
+    assert gradient_array[5].tolist() == list(RED)
+    assert gradient_array[9].tolist() == list(WHITE)
+    assert (np.diff(gradient_array[:5, 0].astype(int)) > 0).all()
+    assert (np.diff(gradient_array[5:, 1].astype(int)) > 0).all()
+
+
+def test_gen_gradient_after_last_stop():
+    gradient_array = gradient.gen_gradient(10, [(0, BLACK), (0.5, RED)])
+    assert (gradient_array[5:] == RED).all()
+
+
+def test_gen_gradient_unsorted_stops():
+    assert np.array_equal(
+        gradient.gen_gradient(10, STOPS[::-1]),
+        gradient.gen_gradient(10, STOPS),
+    )
+
+
+@pytest.mark.parametrize("height", [1, 2, 3, 27])
+def test_gen_gradient_short_segments(height: int):
+    # some segments are a row or less
+    stops = [(0.3, BLACK), (0.75, RED), (0.95, WHITE)]
+    gradient_array = gradient.gen_gradient(height, stops)
+    assert gradient_array.shape == (height, 4)
+    # rows past the last stop are its color
+    assert gradient_array[-1].tolist() == list(WHITE)
+
+
+def test_interpolate_stops():
+    colors = gradient.interpolate_stops([[0, 0.25], [0.5, 1]], STOPS)
+    assert colors.shape == (2, 2, 4)
+    assert colors.dtype == np.uint8
+    assert colors[0, 0].tolist() == list(BLACK)
+    assert colors[0, 1].tolist() == [127, 0, 0, 255]
+    assert colors[1, 0].tolist() == list(RED)
+    assert colors[1, 1].tolist() == list(WHITE)
+
+
+def test_gen_gradient_2d():
+    stops = [(0, BLACK), (1, WHITE)]
+    vertical = gradient.gen_gradient_2d(5, 3, stops, "vertical")
+    horizontal = gradient.gen_gradient_2d(5, 3, stops, "horizontal")
+    diagonal = gradient.gen_gradient_2d(5, 3, stops, "diagonal")
+    for table in (vertical, horizontal, diagonal):
+        assert table.shape == (5, 3, 4)
+        assert table[0, 0].tolist() == list(BLACK)
+        assert table[-1, -1].tolist() == list(WHITE)
+
+    # each runs along its own axis only
+    assert (vertical == vertical[:, :1]).all()
+    assert (horizontal == horizontal[:1]).all()
+    assert np.array_equal(
+        vertical[:, 0], gradient.interpolate_stops(np.linspace(0, 1, 5), stops)
+    )
+    assert diagonal[0, -1].tolist() == diagonal[2, 1].tolist()
+
+
+def test_gen_gradient_2d_bad_direction():
+    with pytest.raises(ValueError):
+        gradient.gen_gradient_2d(5, 3, STOPS, "per_column")
+
+
+def test_gen_column_gradients():
+    stops_by_column = [STOPS, [(0, RED), (1, RED)], STOPS[::-1]]
+    table = gradient.gen_column_gradients(10, stops_by_column)
+    assert table.shape == (10, 3, 4)
+    for column, stops in enumerate(stops_by_column):
+        assert np.array_equal(
+            table[:, column], gradient.gen_gradient(10, stops)
+        )
+
+
+def test_per_column_raster():
+    table = gradient.rasterize("rainbow", 10, width=4, direction="per_column")
+    assert table.shape == (10, 4, 4)
+    # the first column is the gradient as it is, the rest have their hue
+    # shifted further and further
+    assert np.array_equal(table[:, 0], gradient.rasterize("rainbow", 10))
+    for column in range(1, 4):
+        assert not np.array_equal(table[:, column], table[:, 0])
+
+
+def write_svg(path, first_color: str) -> None:
+    path.write_text(SVG.format(first_color))
+    # make sure the change is seen, however coarse the file system's times
+    mtime = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def raster_cache(tmp_path, monkeypatch):
+    """An empty raster cache, with a gradient named "test" to cache"""
+    monkeypatch.setattr(gradient, "GRADIENTS", tmp_path)
+    monkeypatch.setattr(gradient, "_rasters", OrderedDict())
+    monkeypatch.setattr(gradient, "_rasters_bytes", 0)
+    monkeypatch.setattr(gradient, "_raster_directory", None)
+    gradient.set_raster_directory(tmp_path / "rasters")
+    svg = tmp_path / "test.svg"
+    write_svg(svg, "#000000")
+    return svg
+
+
+def test_raster_cache_hit(raster_cache):
+    raster = gradient.rasterize("test", 10)
+    assert raster[0].tolist() == list(BLACK)
+    assert not raster.flags.writeable
+    assert gradient.rasterize("test", 10) is raster
+    assert len(list((raster_cache.parent / "rasters").glob("*.npy"))) == 1
+
+
+def test_raster_cache_on_disk(raster_cache, monkeypatch):
+    raster = gradient.rasterize("test", 10, width=4, direction="diagonal")
+    # as if in another process
+    gradient._rasters.clear()
+
+    def build_raster(*args):
+        raise AssertionError("the raster should be read from disk")
+
+    monkeypatch.setattr(gradient, "_build_raster", build_raster)
+    assert np.array_equal(
+        gradient.rasterize("test", 10, width=4, direction="diagonal"), raster
+    )
+
+
+def test_raster_cache_svg_changed(raster_cache):
+    assert gradient.rasterize("test", 10)[0].tolist() == list(BLACK)
+    write_svg(raster_cache, "#ff0000")
+    assert gradient.rasterize("test", 10)[0].tolist() == list(RED)
+
+    # and not read from disk either
+    gradient._rasters.clear()
+    assert gradient.rasterize("test", 10)[0].tolist() == list(RED)
+
+
+def test_raster_cache_eviction(raster_cache, monkeypatch):
+    # room for two rasters of 10 rows
+    monkeypatch.setattr(gradient, "RASTER_CACHE_BYTES", 2 * 10 * 4)
+    gradient.rasterize("test", 10)
+    gradient.rasterize("test", 9)
+    # used most recently, so it is kept over the one 9 rows tall
+    gradient.rasterize("test", 10)
+    gradient.rasterize("test", 8)
+    heights = [key[2] for key in gradient._rasters]
+    assert heights == [10, 8]
+    assert gradient._rasters_bytes == (10 + 8) * 4
@@ -0,0 +1,305 @@
+"""Time each stage that runs once per frame, to see what frame rate it allows.
+
+Every stage is timed at each size in `SIZES`, using 24 bins like the Teensy
+sends. Each is also timed against a fixed workload of small numpy calls,
+timed right before it, so comparisons aren't thrown off by how fast the
+machine is or how busy it is at the time. Requires `spectral_analyzer`,
+`led_wall_driver_software` and `pongwall_server` to be importable (and
+`spectral_analyzer`'s `config.toml`).
+
+Args:
+    1: "run" to print the timings, "save" to also write them to the baseline,
+        or "compare" to compare them to the baseline, marking the stages
+        that got slower than the reference workload by more than the
+        threshold, and exit with 1 if the baseline doesn't have the same
+        stages (default: "run"). Timings still vary from run to run, so
+        slower stages are only reported; check them again before trusting
+        them.
+    2: the baseline file (default: benchmark_baseline.json next to this file)
+    3: the threshold, as a fraction of the baseline (default: 0.25)
+"""
+
+import contextlib
+import io
+import json
+import pickle
+import socket
+import struct
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Tuple
+
+import numpy as np
+
+BINS_QTY = 24
+# (width, height), the first is the matrix we have
+SIZES = ((48, 27), (96, 54), (192, 108))
+GRADIENT = "rainbow"
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+
+# how long to time each stage for, and how many times to repeat that
+_MIN_TIME = 0.2
+_REPEATS = 5
+# the reference workload is timed before every stage, so more briefly
+_REFERENCE_MIN_TIME = 0.05
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+
+def _receive_exactly(sock: socket.socket, n: int) -> bytes:
+    data = bytearray(n)
+    view = memoryview(data)
+    while n:
+        n -= sock.recv_into(view[len(data) - n :], n)
+    return bytes(data)
+
+
+@contextlib.contextmanager
+def _connected_remote_wall(width: int, height: int):
+    """A `RemoteLEDWall` connected to a socket standing in for the server"""
+    from spectral_analyzer import remote_led_wall
+
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        port = listener.getsockname()[1]
+        wall = remote_led_wall.RemoteLEDWall(
+            width, height, f"127.0.0.1:{port}", brightness=50
+        )
+        server, _ = listener.accept()
+    # frames are received after they are all sent, so they must fit
+    buffer_size = 4 * width * height * 3
+    wall.led_wall_connection.setsockopt(
+        socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size
+    )
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+    with wall.led_wall_connection, server:
+        yield wall, server
+
+
+def _normalizer_benchmarks(rng: np.random.Generator) -> Iterator[Benchmark]:
+    from spectral_analyzer import teensy_reciever
+
+    normalizer = teensy_reciever.BinNormalizer()
+    raw_bins = rng.random(BINS_QTY, dtype=np.float32) / 1000
+    normalizer("l", raw_bins)
+    yield "teensy_reciever.BinNormalizer", lambda: normalizer("l", raw_bins)
+
+
+def _style_benchmarks(
+    width: int, height: int, rng: np.random.Generator
+) -> Iterator[Benchmark]:
+    from spectral_analyzer.frame_generation import (
+        color_transform,
+        compositing,
+        display_styles,
+        gradient,
+        registry,
+    )
+
+    left = rng.random(BINS_QTY)
+    right = rng.random(BINS_QTY)
+    for name, style_class in registry.styles.items():
+        style = style_class(width, height, GRADIENT)
+        yield f"display_styles.{name}", lambda style=style: style(left, right)
+
+    compositor = compositing.Compositor(
+        [
+            (display_styles.ShiftingHue(width, height, GRADIENT), 0.3),
+            (display_styles.CenterOut(width, height, GRADIENT), 1),
+        ]
+    )
+    yield "compositing.Compositor", lambda: compositor(left, right)
+
+    diagonal = display_styles.BottomUp(
+        width, height, GRADIENT, gradient_direction="diagonal"
+    )
+    yield "display_styles.bottom_up(diagonal)", lambda: diagonal(left, right)
+
+    stops = gradient.svg_to_gradient(GRADIENT)
+    yield "gradient.gen_gradient", lambda: gradient.gen_gradient(height, stops)
+    yield "gradient.rasterize", lambda: gradient.rasterize(GRADIENT, height)
+    yield "gradient.gen_gradient_2d", lambda: gradient.gen_gradient_2d(
+        height, width, stops, "diagonal"
+    )
+
+    frame = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    transformed = np.empty_like(frame)
+    transformer = color_transform.ColorTransformer(frame.shape)
+    transform = color_transform.ColorTransform(0.25, 0.8, 0.9, 2.2)
+    yield "color_transform.ColorTransformer", lambda: transformer(
+        frame, transform, transformed
+    )
+
+
+def _output_benchmarks(
+    width: int, height: int, rng: np.random.Generator
+) -> Iterator[Benchmark]:
+    import led_wall_driver_software
+    from pongwall_server import frame as pongwall_frame
+    from pongwall_server import pongwall_serial_protocol
+    from spectral_analyzer import calibration, dithering
+
+    rgba_frame = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    rgb_frame = np.ascontiguousarray(rgba_frame[:, :, :3])
+
+    class NullPort:
+        def write(self, data) -> None:
+            pass
+
+        def readline(self) -> None:
+            pass
+
+    led_wall = led_wall_driver_software.LEDWall(NullPort(), width, height)
+    yield "LEDWall.__call__", lambda: led_wall(rgb_frame)
+
+    # dim, where dithering matters most
+    levels = calibration.Calibration(brightness=0.1).levels()
+    led_frame_size = width * height * calibration.CHANNELS
+    dither = dithering.TemporalDither(levels, led_frame_size)
+    indexes = rng.integers(0, len(levels), led_frame_size).astype(np.intp)
+    dithered = np.empty(led_frame_size, dtype=np.uint8)
+    yield "dithering.TemporalDither", lambda: dither(indexes, dithered)
+
+    def make_data() -> bytes:
+        # it prints how long it took
+        with contextlib.redirect_stdout(io.StringIO()):
+            return pongwall_frame.make_data(rgba_frame)
+
+    yield "frame.make_data", make_data
+
+    data = make_data()
+    yield "pongwall_serial_protocol.create_packet", lambda: (
+        pongwall_serial_protocol.create_packet(data)
+    )
+
+
+def _framing_benchmarks(
+    wall, server: socket.socket, rgba_frame: np.ndarray
+) -> Iterator[Benchmark]:
+    def send_and_receive() -> np.ndarray:
+        wall.send_frame(rgba_frame)
+        # the same as `MatrixServer.run`
+        header = _receive_exactly(server, 8)
+        packet_size = struct.unpack("!Q", header)[0]
+        return pickle.loads(_receive_exactly(server, packet_size))
+
+    yield "RemoteLEDWall.send_frame+MatrixServer.run", send_and_receive
+
+
+def _reference() -> Callable[[], None]:
+    """A fixed workload of small numpy calls, like the stages make"""
+    values = np.random.default_rng(0).random(1024)
+    out = np.empty_like(values)
+
+    def reference() -> None:
+        for _ in range(10):
+            np.multiply(values, 0.5, out=out)
+            np.add(out, values, out=out)
+            np.sqrt(out, out=out)
+
+    return reference
+
+
+def _time(
+    function: Callable[[], object], min_time: float = _MIN_TIME
+) -> float:
+    """The seconds one call takes, at best"""
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / elapsed))
+    return min(timer.repeat(_REPEATS, number)) / number
+
+
+def run() -> Dict[str, float]:
+    """Time every stage at every size
+
+    Returns:
+        how many times longer each stage takes than the reference workload,
+            by "<stage>@<width>x<height>" (or just "<stage>" for the stages
+            that don't depend on the size)
+    """
+    rng = np.random.default_rng(0)
+    reference = _reference()
+    results = {}
+
+    def record(benchmarks: Iterator[Benchmark], suffix: str = "") -> None:
+        for name, function in benchmarks:
+            name += suffix
+            reference_seconds = _time(reference, _REFERENCE_MIN_TIME)
+            seconds = _time(function)
+            results[name] = relative = seconds / reference_seconds
+            print(
+                f"{name:<56} {seconds * 1e6:10.1f}us {1 / seconds:10.0f}fps "
+                f"{relative:8.2f}x"
+            )
+
+    record(_normalizer_benchmarks(rng))
+    for width, height in SIZES:
+        suffix = f"@{width}x{height}"
+        record(_style_benchmarks(width, height, rng), suffix)
+        record(_output_benchmarks(width, height, rng), suffix)
+        rgba_frame = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        with _connected_remote_wall(width, height) as (wall, server):
+            record(_framing_benchmarks(wall, server, rgba_frame), suffix)
+    return results
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> bool:
+    """Print how each stage changed from the baseline
+
+    Stages that got slower than the reference workload by more than
+    `threshold` are marked.
+
+    Returns:
+        whether the baseline is out of date (it is missing a stage that was
+            run, or has one that wasn't)
+    """
+    out_of_date = False
+    for name, relative in results.items():
+        if name not in baseline:
+            out_of_date = True
+            print(f"{name:<56} NOT IN THE BASELINE")
+            continue
+        change = relative / baseline[name] - 1
+        verdict = "SLOWER" if change > threshold else ""
+        print(f"{name:<56} {change:+8.1%} {verdict}")
+    for name in sorted(baseline.keys() - results.keys()):
+        out_of_date = True
+        print(f"{name:<56} NO LONGER RUN")
+    return out_of_date
+
+
+def main(mode: str, baseline_path: Path, threshold: float):
+    if mode not in ("run", "save", "compare"):
+        sys.exit(f"unknown mode: {mode}")
+
+    results = run()
+
+    if mode == "save":
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+        print(f"saved to {baseline_path}")
+    elif mode == "compare":
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, threshold):
+            sys.exit(
+                "the baseline is out of date (run with 'save' to update it)"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        mode=sys.argv[1] if len(sys.argv) > 1 else "run",
+        baseline_path=(
+            Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BASELINE
+        ),
+        threshold=(
+            float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_THRESHOLD
+        ),
+    )
@@ -0,0 +1,61 @@
+"""Stand in for the Teensy by emitting bins on a pseudo terminal.
+
+Point `serial_port` in `config.toml` at the printed path.
+
+Args:
+    1: packet format, one of "text", "binary" or "mixed" (default: "mixed")
+    2: frames per second (default: 86)
+"""
+
+import os
+import pty
+import struct
+import sys
+import time
+import tty
+
+import numpy as np
+
+BINS_QTY = 24
+# must match `teensy_reciever.PACKET_SYNC` and `PACKET_HEADER`
+PACKET_SYNC = b"\xa5\x5a"
+PACKET_HEADER = struct.Struct("<2scIB")
+
+
+def text_packet(channel: str, id: int, bins: np.ndarray) -> bytes:
+    bins_string = ",".join(f"{bin:.16f}" for bin in bins)
+    return f"{channel}:{id}:{bins_string}\r\n".encode()
+
+
+def binary_packet(channel: str, id: int, bins: np.ndarray) -> bytes:
+    header = PACKET_HEADER.pack(PACKET_SYNC, channel.encode(), id, len(bins))
+    return header + bins.astype("<f4").tobytes()
+
+
+def main(packet_format: str, fps: float):
+    controller, device = pty.openpty()
+    # a real Teensy does not echo anything back
+    tty.setraw(device)
+    print(f"emitting {packet_format} packets on {os.ttyname(device)}")
+
+    rng = np.random.default_rng()
+    id = 0
+    while True:
+        for channel in ("l", "r"):
+            bins = rng.random(BINS_QTY, dtype=np.float32) / 1000
+            if packet_format == "binary" or (
+                packet_format == "mixed" and id % 2
+            ):
+                packet = binary_packet(channel, id, bins)
+            else:
+                packet = text_packet(channel, id, bins)
+            os.write(controller, packet)
+        id += 1
+        time.sleep(1 / fps)
+
+
+if __name__ == "__main__":
+    main(
+        packet_format=sys.argv[1] if len(sys.argv) > 1 else "mixed",
+        fps=float(sys.argv[2]) if len(sys.argv) > 2 else 86,
+    )